@@ -11,6 +11,7 @@ except ImportError:
 
 import json
 import re
+from collections import Counter
 from typing import Dict, List, Tuple, Optional
 from django.conf import settings
 import logging
@@ -381,8 +382,9 @@ class RecommendationEngine:
     def _generate_reasoning(self, stock_symbol: str, recommendation: str, articles: List[Dict], net_sentiment: float) -> str:
         """Generate human-readable reasoning for the recommendation"""
         article_count = len(articles)
-        positive_count = sum(1 for a in articles if a.get('sentiment') == 'POSITIVE')
-        negative_count = sum(1 for a in articles if a.get('sentiment') == 'NEGATIVE')
+        sentiment_counts = Counter(a.get('sentiment') for a in articles)
+        positive_count = sentiment_counts['POSITIVE']
+        negative_count = sentiment_counts['NEGATIVE']
         
         sentiment_desc = "positive" if net_sentiment > 0 else "negative" if net_sentiment < 0 else "mixed"
         
@@ -46,7 +46,7 @@ class EntrySignalAnalyzer:
             # Check if there's recent negative news indicating a dip
             negative_news = NewsArticle.objects.filter(
                 mentioned_stocks=stock,
-                sentiment='NEGATIVE',
+                sentiment=NewsArticle.Sentiment.NEGATIVE,
                 published_at__gte=timezone.now() - timedelta(days=days_lookback)
             ).count()
             
@@ -55,11 +55,11 @@ class EntrySignalAnalyzer:
                 estimated_dip = min(negative_news * 2.5, 10)  # Max 10%
                 
                 if estimated_dip >= dip_threshold:
-                    signal_strength = 'STRONG' if estimated_dip >= 7 else 'MODERATE'
+                    signal_strength = EntryOpportunity.SignalStrength.STRONG if estimated_dip >= 7 else EntryOpportunity.SignalStrength.MODERATE
                     
                     opportunity = EntryOpportunity(
                         stock=stock,
-                        opportunity_type='PRICE_DIP',
+                        opportunity_type=EntryOpportunity.OpportunityType.PRICE_DIP,
                         signal_date=self.today,
                         signal_strength=signal_strength,
                         price_at_signal=stock.current_price,
@@ -89,7 +89,7 @@ class EntrySignalAnalyzer:
         
         news_articles = NewsArticle.objects.filter(
             published_at__gte=cutoff_date,
-            sentiment__in=['POSITIVE', 'NEUTRAL']
+            sentiment__in=[NewsArticle.Sentiment.POSITIVE, NewsArticle.Sentiment.NEUTRAL]
         )
         
         for article in news_articles:
@@ -102,16 +102,16 @@ class EntrySignalAnalyzer:
                     # Check if we already have this signal
                     existing = EntryOpportunity.objects.filter(
                         stock=stock,
-                        opportunity_type='ORDER_WIN',
+                        opportunity_type=EntryOpportunity.OpportunityType.ORDER_WIN,
                         signal_date__gte=self.today - timedelta(days=7)
                     ).exists()
                     
                     if not existing:
-                        signal_strength = 'STRONG' if 'major' in title_lower or 'significant' in title_lower else 'MODERATE'
+                        signal_strength = EntryOpportunity.SignalStrength.STRONG if 'major' in title_lower or 'significant' in title_lower else EntryOpportunity.SignalStrength.MODERATE
                         
                         opportunity = EntryOpportunity(
                             stock=stock,
-                            opportunity_type='ORDER_WIN',
+                            opportunity_type=EntryOpportunity.OpportunityType.ORDER_WIN,
                             signal_date=article.published_at.date(),
                             signal_strength=signal_strength,
                             price_at_signal=stock.current_price,
@@ -137,26 +137,26 @@ class EntrySignalAnalyzer:
         
         # Get dividend corporate actions
         dividend_actions = CorporateAction.objects.filter(
-            action_type='DIVIDEND',
+            action_type=CorporateAction.ActionType.DIVIDEND,
             announcement_date__gte=cutoff_date
-        ).select_related('stock')
+        ).select_related('stock').iterator(chunk_size=2000)
         
         for action in dividend_actions:
             # Check if we already have this signal
             existing = EntryOpportunity.objects.filter(
                 stock=action.stock,
-                opportunity_type='DIVIDEND',
+                opportunity_type=EntryOpportunity.OpportunityType.DIVIDEND,
                 signal_date=action.announcement_date
             ).exists()
             
             if not existing:
                 # Determine strength based on dividend amount
                 dividend_amount = action.dividend_amount or 0
-                signal_strength = 'STRONG' if dividend_amount > 10 else 'MODERATE' if dividend_amount > 5 else 'WEAK'
+                signal_strength = EntryOpportunity.SignalStrength.STRONG if dividend_amount > 10 else EntryOpportunity.SignalStrength.MODERATE if dividend_amount > 5 else EntryOpportunity.SignalStrength.WEAK
                 
                 opportunity = EntryOpportunity(
                     stock=action.stock,
-                    opportunity_type='DIVIDEND',
+                    opportunity_type=EntryOpportunity.OpportunityType.DIVIDEND,
                     signal_date=action.announcement_date,
                     signal_strength=signal_strength,
                     price_at_signal=action.stock.current_price,
@@ -185,7 +185,7 @@ class EntrySignalAnalyzer:
         
         news_articles = NewsArticle.objects.filter(
             published_at__gte=cutoff_date,
-            sentiment='POSITIVE',
+            sentiment=NewsArticle.Sentiment.POSITIVE,
             category__name__in=['MERGER', 'SECTOR', 'EARNINGS']
         )
         
@@ -199,16 +199,16 @@ class EntrySignalAnalyzer:
                     # Check if we already have this signal
                     existing = EntryOpportunity.objects.filter(
                         stock=stock,
-                        opportunity_type='EXPANSION',
+                        opportunity_type=EntryOpportunity.OpportunityType.EXPANSION,
                         signal_date__gte=self.today - timedelta(days=7)
                     ).exists()
                     
                     if not existing:
-                        signal_strength = 'STRONG' if any(word in title_lower for word in ['major', 'significant', 'massive']) else 'MODERATE'
+                        signal_strength = EntryOpportunity.SignalStrength.STRONG if any(word in title_lower for word in ['major', 'significant', 'massive']) else EntryOpportunity.SignalStrength.MODERATE
                         
                         opportunity = EntryOpportunity(
                             stock=stock,
-                            opportunity_type='EXPANSION',
+                            opportunity_type=EntryOpportunity.OpportunityType.EXPANSION,
                             signal_date=article.published_at.date(),
                             signal_strength=signal_strength,
                             price_at_signal=stock.current_price,
@@ -234,24 +234,24 @@ class EntrySignalAnalyzer:
         
         # Get stock split corporate actions
         split_actions = CorporateAction.objects.filter(
-            action_type='SPLIT',
+            action_type=CorporateAction.ActionType.SPLIT,
             announcement_date__gte=cutoff_date
-        ).select_related('stock')
+        ).select_related('stock').iterator(chunk_size=2000)
         
         for action in split_actions:
             # Check if we already have this signal
             existing = EntryOpportunity.objects.filter(
                 stock=action.stock,
-                opportunity_type='SPLIT',
+                opportunity_type=EntryOpportunity.OpportunityType.SPLIT,
                 signal_date=action.announcement_date
             ).exists()
             
             if not existing:
                 opportunity = EntryOpportunity(
                     stock=action.stock,
-                    opportunity_type='SPLIT',
+                    opportunity_type=EntryOpportunity.OpportunityType.SPLIT,
                     signal_date=action.announcement_date,
-                    signal_strength='STRONG',
+                    signal_strength=EntryOpportunity.SignalStrength.STRONG,
                     price_at_signal=action.stock.current_price,
                     description=f"Stock split announced: {action.split_ratio}. Record date: {action.record_date}",
                     expires_at=action.record_date if action.record_date else self.today + timedelta(days=45)
@@ -275,24 +275,24 @@ class EntrySignalAnalyzer:
         
         # Get bonus issue corporate actions
         bonus_actions = CorporateAction.objects.filter(
-            action_type='BONUS',
+            action_type=CorporateAction.ActionType.BONUS,
             announcement_date__gte=cutoff_date
-        ).select_related('stock')
+        ).select_related('stock').iterator(chunk_size=2000)
         
         for action in bonus_actions:
             # Check if we already have this signal
             existing = EntryOpportunity.objects.filter(
                 stock=action.stock,
-                opportunity_type='BONUS',
+                opportunity_type=EntryOpportunity.OpportunityType.BONUS,
                 signal_date=action.announcement_date
             ).exists()
             
             if not existing:
                 opportunity = EntryOpportunity(
                     stock=action.stock,
-                    opportunity_type='BONUS',
+                    opportunity_type=EntryOpportunity.OpportunityType.BONUS,
                     signal_date=action.announcement_date,
-                    signal_strength='STRONG',
+                    signal_strength=EntryOpportunity.SignalStrength.STRONG,
                     price_at_signal=action.stock.current_price,
                     description=f"Bonus shares announced: {action.bonus_ratio}. Record date: {action.record_date}",
                     expires_at=action.record_date if action.record_date else self.today + timedelta(days=45)
@@ -351,12 +351,12 @@ class EntrySignalAnalyzer:
     def _get_result_key(self, opportunity_type):
         """Map opportunity type to result key"""
         mapping = {
-            'PRICE_DIP': 'price_dips',
-            'ORDER_WIN': 'order_wins',
-            'DIVIDEND': 'dividends',
-            'EXPANSION': 'expansions',
-            'SPLIT': 'splits',
-            'BONUS': 'bonuses',
+            EntryOpportunity.OpportunityType.PRICE_DIP: 'price_dips',
+            EntryOpportunity.OpportunityType.ORDER_WIN: 'order_wins',
+            EntryOpportunity.OpportunityType.DIVIDEND: 'dividends',
+            EntryOpportunity.OpportunityType.EXPANSION: 'expansions',
+            EntryOpportunity.OpportunityType.SPLIT: 'splits',
+            EntryOpportunity.OpportunityType.BONUS: 'bonuses',
         }
         return mapping.get(opportunity_type, 'total')
     
@@ -426,19 +426,14 @@ def trading_signals(request):
                     holdings = fetcher.fetch_promoter_holding(stock.symbol)
                     
                     if holdings:
-                        # Save to database
-                        for holding_data in holdings:
-                            try:
-                                obj, created = PromoterHolding.objects.update_or_create(
-                                    stock=stock,
-                                    quarter_end_date=holding_data['quarter_end_date'],
-                                    defaults=holding_data
-                                )
-                                if created:
-                                    saved_count += 1
-                            except Exception as e:
-                                logger.warning(f"Error saving promoter holding: {e}")
-                                continue
+                        # Save all quarters in one upsert
+                        try:
+                            saved_count += PromoterHolding.bulk_upsert(
+                                [PromoterHolding(stock=stock, **h) for h in holdings if h.get('quarter_end_date')],
+                                fields={field for h in holdings for field in h},
+                            )
+                        except Exception as e:
+                            logger.warning(f"Error saving promoter holdings: {e}")
                         
                         fetch_count += 1
                     
@@ -484,6 +479,7 @@ def trading_signals(request):
     # Initialize analyzers
     analyzer = SignalAnalyzer()
     from analysis.entry_signal_analyzer import EntrySignalAnalyzer
+    from portfolio.models import EntryOpportunity
     entry_analyzer = EntrySignalAnalyzer()
     
     # Get buy signals
@@ -506,8 +502,9 @@ def trading_signals(request):
     }
     
     for opp in entry_opportunities:
-        if opp.opportunity_type in entry_by_type:
-            entry_by_type[opp.opportunity_type].append(opp)
+        opportunity_type = EntryOpportunity.OpportunityType(opp.opportunity_type).name
+        if opportunity_type in entry_by_type:
+            entry_by_type[opportunity_type].append(opp)
     
     context = {
         'fii_increased': buy_signals['fii_increased'],
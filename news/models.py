@@ -98,12 +98,13 @@ class Stock(models.Model):
 
 class NewsArticle(models.Model):
     """Main model for news articles"""
-    SENTIMENT_CHOICES = [
-        ('POSITIVE', 'Positive'),
-        ('NEGATIVE', 'Negative'),
-        ('NEUTRAL', 'Neutral'),
-        ('PENDING', 'Pending Analysis'),
-    ]
+    class Sentiment(models.TextChoices):
+        POSITIVE = 'POSITIVE', 'Positive'
+        NEGATIVE = 'NEGATIVE', 'Negative'
+        NEUTRAL = 'NEUTRAL', 'Neutral'
+        PENDING = 'PENDING', 'Pending Analysis'
+    
+    SENTIMENT_CHOICES = Sentiment.choices
     
     IMPACT_CHOICES = [
         ('HIGH', 'High Impact'),
@@ -120,7 +121,7 @@ class NewsArticle(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     
     # AI Analysis fields
-    sentiment = models.CharField(max_length=10, choices=SENTIMENT_CHOICES, default='PENDING')
+    sentiment = models.CharField(max_length=10, choices=Sentiment.choices, default=Sentiment.PENDING)
     sentiment_score = models.FloatField(null=True, blank=True)  # -1 to 1 scale
     impact_level = models.CharField(max_length=10, choices=IMPACT_CHOICES, default='PENDING')
     confidence_score = models.FloatField(null=True, blank=True)  # 0 to 1 scale
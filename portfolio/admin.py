@@ -33,6 +33,10 @@ class HoldingAdmin(admin.ModelAdmin):
     search_fields = ['stock__symbol', 'stock__company_name']
     readonly_fields = ['created_at', 'updated_at']
     
+    def get_queryset(self, request):
+        # Each row shows the stock and its valuation, so compute both in the same query
+        return super().get_queryset(request).with_financials()
+    
     def current_value(self, obj):
         return f"₹{obj.current_value():,.2f}"
     current_value.short_description = 'Current Value'
@@ -49,10 +53,11 @@ class HoldingAdmin(admin.ModelAdmin):
 @admin.register(InsiderTrade)
 class InsiderTradeAdmin(admin.ModelAdmin):
     list_display = ['stock', 'insider_name', 'transaction_type', 'quantity', 'transaction_date', 'exchange']
+    list_select_related = ['stock']
     list_filter = ['transaction_type', 'exchange', 'transaction_date', 'stock__sector']
     search_fields = ['stock__symbol', 'insider_name', 'insider_designation']
     date_hierarchy = 'transaction_date'
-    readonly_fields = ['created_at']
+    readonly_fields = ['total_value', 'created_at']
     
     fieldsets = (
         ('Stock Information', {
@@ -77,6 +82,7 @@ class InsiderTradeAdmin(admin.ModelAdmin):
 @admin.register(BulkDeal)
 class BulkDealAdmin(admin.ModelAdmin):
     list_display = ['stock', 'client_name', 'deal_type', 'quantity', 'price_per_share', 'total_value', 'deal_date']
+    list_select_related = ['stock']
     list_filter = ['deal_type', 'exchange', 'deal_date', 'stock__sector']
     search_fields = ['stock__symbol', 'client_name']
     date_hierarchy = 'deal_date'
@@ -86,6 +92,7 @@ class BulkDealAdmin(admin.ModelAdmin):
 @admin.register(BlockDeal)
 class BlockDealAdmin(admin.ModelAdmin):
     list_display = ['stock', 'client_name', 'deal_type', 'quantity', 'price_per_share', 'total_value', 'deal_date']
+    list_select_related = ['stock']
     list_filter = ['deal_type', 'exchange', 'deal_date', 'stock__sector']
     search_fields = ['stock__symbol', 'client_name']
     date_hierarchy = 'deal_date'
@@ -95,6 +102,7 @@ class BlockDealAdmin(admin.ModelAdmin):
 @admin.register(CorporateAction)
 class CorporateActionAdmin(admin.ModelAdmin):
     list_display = ['stock', 'action_type', 'ex_date', 'announcement_date', 'get_details']
+    list_select_related = ['stock']
     list_filter = ['action_type', 'ex_date', 'stock__sector']
     search_fields = ['stock__symbol', 'description']
     date_hierarchy = 'ex_date'
@@ -108,7 +116,13 @@ class CorporateActionAdmin(admin.ModelAdmin):
             'fields': ('ex_date', 'record_date', 'payment_date', 'announcement_date')
         }),
         ('Action Details', {
-            'fields': ('dividend_amount', 'bonus_ratio', 'split_ratio', 'rights_ratio', 'rights_price')
+            'fields': (
+                'dividend_amount',
+                ('bonus_num', 'bonus_den'),
+                ('split_num', 'split_den'),
+                ('rights_num', 'rights_den'),
+                'rights_price',
+            )
         }),
         ('Additional Info', {
             'fields': ('remarks',),
@@ -117,11 +131,11 @@ class CorporateActionAdmin(admin.ModelAdmin):
     )
     
     def get_details(self, obj):
-        if obj.action_type == 'DIVIDEND' and obj.dividend_amount:
+        if obj.action_type == CorporateAction.ActionType.DIVIDEND and obj.dividend_amount:
             return f"₹{obj.dividend_amount}"
-        elif obj.action_type == 'BONUS' and obj.bonus_ratio:
+        elif obj.action_type == CorporateAction.ActionType.BONUS and obj.bonus_ratio:
             return obj.bonus_ratio
-        elif obj.action_type == 'SPLIT' and obj.split_ratio:
+        elif obj.action_type == CorporateAction.ActionType.SPLIT and obj.split_ratio:
             return obj.split_ratio
         return "-"
     get_details.short_description = 'Details'
@@ -130,11 +144,16 @@ class CorporateActionAdmin(admin.ModelAdmin):
 @admin.register(PromoterHolding)
 class PromoterHoldingAdmin(admin.ModelAdmin):
     list_display = ['stock', 'quarter_end_date', 'promoter_holding', 'promoter_pledged', 'public_holding', 'get_change']
+    list_select_related = ['stock']
     list_filter = ['quarter_end_date', 'stock__sector']
     search_fields = ['stock__symbol']
     date_hierarchy = 'quarter_end_date'
     readonly_fields = ['created_at', 'updated_at']
     
+    def get_queryset(self, request):
+        # Compute each row's quarter-on-quarter change in the list query itself
+        return super().get_queryset(request).with_change()
+    
     def get_change(self, obj):
         change = obj.promoter_change()
         if change > 0:
@@ -149,6 +168,7 @@ class PromoterHoldingAdmin(admin.ModelAdmin):
 @admin.register(ShareholdingPattern)
 class ShareholdingPatternAdmin(admin.ModelAdmin):
     list_display = ['stock', 'quarter_end_date', 'indian_promoters', 'foreign_promoters', 'fii', 'dii', 'retail_investors']
+    list_select_related = ['stock']
     list_filter = ['quarter_end_date', 'stock__sector']
     search_fields = ['stock__symbol']
     date_hierarchy = 'quarter_end_date'
@@ -158,6 +178,7 @@ class ShareholdingPatternAdmin(admin.ModelAdmin):
 @admin.register(EntryOpportunity)
 class EntryOpportunityAdmin(admin.ModelAdmin):
     list_display = ['stock', 'opportunity_type', 'signal_strength', 'signal_date', 'price_at_signal', 'percentage_change', 'is_active', 'expires_at']
+    list_select_related = ['stock']
     list_filter = ['opportunity_type', 'signal_strength', 'is_active', 'signal_date']
     search_fields = ['stock__symbol', 'stock__company_name', 'description']
     date_hierarchy = 'signal_date'
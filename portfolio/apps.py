@@ -3,4 +3,9 @@ from django.apps import AppConfig
 
 class PortfolioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'portfolio'
\ No newline at end of file
+    name = 'portfolio'
+    
+    def ready(self):
+        from . import signals  # Register signal handlers
+        from .indicators import warm_up
+        warm_up()  # Compile the numba indicator kernel once per process
@@ -3,16 +3,42 @@ Image processing utilities for extracting stock holding information from screens
 """
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from decimal import Decimal
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Pattern for stock symbols (e.g., RELIANCE, TCS, HDFCBANK)
+_SYMBOL_RE = re.compile(r'\b[A-Z]{2,12}\b')
+_BARE_SYMBOL_RE = re.compile(r'^[A-Z]{2,12}$')
+
+# Pattern for numbers with optional commas and decimals
+_NUMBER_PATTERN = r'[\d,]+\.?\d*'
+_NUMBER_RE = re.compile(_NUMBER_PATTERN)
+
+# Pattern for price (with rupee symbol or without)
+_PRICE_RE = re.compile(r'[₹₨]?\s*' + _NUMBER_PATTERN)
+
+# Currency symbols, commas and whitespace stripped before numeric conversion
+_NUMBER_NOISE_RE = re.compile(r'[,\s₹₨]')
+
+# JSON array embedded in an AI model response
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
 
 class PortfolioImageProcessor:
     """Extract stock holding information from broker app screenshots using OCR"""
     
+    # Keywords identifying the broker app a screenshot was taken from
+    BROKER_KEYWORDS = {
+        'zerodha': ['zerodha', 'kite'],
+        'groww': ['groww'],
+        'upstox': ['upstox'],
+        'angelone': ['angel one', 'angelone', 'angel broking'],
+        'hdfc': ['hdfc securities'],
+        'icici': ['icici direct'],
+    }
+    
     def __init__(self):
         self.ocr_available = self._check_ocr_availability()
     
@@ -75,16 +101,7 @@ class PortfolioImageProcessor:
         """Detect broker from screenshot text"""
         text_lower = text.lower()
         
-        broker_keywords = {
-            'zerodha': ['zerodha', 'kite'],
-            'groww': ['groww'],
-            'upstox': ['upstox'],
-            'angelone': ['angel one', 'angelone', 'angel broking'],
-            'hdfc': ['hdfc securities'],
-            'icici': ['icici direct'],
-        }
-        
-        for broker, keywords in broker_keywords.items():
+        for broker, keywords in self.BROKER_KEYWORDS.items():
             if any(keyword in text_lower for keyword in keywords):
                 return broker
         
@@ -104,15 +121,6 @@ class PortfolioImageProcessor:
         holdings = []
         lines = text.split('\n')
         
-        # Pattern for stock symbols (e.g., RELIANCE, TCS, HDFCBANK)
-        symbol_pattern = r'\b[A-Z]{2,12}\b'
-        
-        # Pattern for numbers with optional commas and decimals
-        number_pattern = r'[\d,]+\.?\d*'
-        
-        # Pattern for price (with rupee symbol or without)
-        price_pattern = r'[₹₨]?\s*' + number_pattern
-        
         current_holding = {}
         
         for i, line in enumerate(lines):
@@ -121,7 +129,7 @@ class PortfolioImageProcessor:
                 continue
             
             # Look for stock symbols
-            symbols = re.findall(symbol_pattern, line)
+            symbols = _SYMBOL_RE.findall(line)
             
             # Common stock symbols in NSE
             if symbols:
@@ -138,24 +146,24 @@ class PortfolioImageProcessor:
             
             # Look for quantity
             if any(keyword in line.upper() for keyword in ['QTY', 'QUANTITY', 'SHARES']):
-                numbers = re.findall(number_pattern, line)
+                numbers = _NUMBER_RE.findall(line)
                 if numbers and 'symbol' in current_holding:
                     # Find quantity (usually first number after Qty keyword)
                     qty_index = max([line.upper().find(kw) for kw in ['QTY', 'QUANTITY', 'SHARES']])
                     remaining_text = line[qty_index:]
-                    qty_numbers = re.findall(number_pattern, remaining_text)
+                    qty_numbers = _NUMBER_RE.findall(remaining_text)
                     if qty_numbers:
                         current_holding['quantity'] = self._clean_number(qty_numbers[0])
             
             # Look for average/buy price
             if any(keyword in line.upper() for keyword in ['AVG', 'AVERAGE', 'BUY PRICE']):
-                prices = re.findall(price_pattern, line)
+                prices = _PRICE_RE.findall(line)
                 if prices and 'symbol' in current_holding:
                     current_holding['avg_price'] = self._clean_price(prices[0])
             
             # Look for current price
             if any(keyword in line.upper() for keyword in ['LTP', 'CMP', 'CURRENT']):
-                prices = re.findall(price_pattern, line)
+                prices = _PRICE_RE.findall(line)
                 if prices and 'symbol' in current_holding:
                     current_holding['current_price'] = self._clean_price(prices[0])
             
@@ -165,9 +173,9 @@ class PortfolioImageProcessor:
                 if len(parts) >= 3:
                     # Check if first part is a stock symbol
                     potential_symbol = parts[0].upper()
-                    if re.match(r'^[A-Z]{2,12}$', potential_symbol):
+                    if _BARE_SYMBOL_RE.match(potential_symbol):
                         # Try to extract quantity and price
-                        numbers = [self._clean_number(p) for p in parts[1:] if re.match(number_pattern, p)]
+                        numbers = [self._clean_number(p) for p in parts[1:] if _NUMBER_RE.match(p)]
                         if len(numbers) >= 2:
                             holdings.append({
                                 'symbol': potential_symbol,
@@ -189,18 +197,13 @@ class PortfolioImageProcessor:
     
     def _clean_number(self, text: str) -> int:
         """Clean and convert text to integer (for quantity)"""
-        try:
-            # Remove commas and convert
-            cleaned = re.sub(r'[,\s₹₨]', '', text)
-            return int(float(cleaned))
-        except (ValueError, AttributeError):
-            return 0
+        return int(self._clean_price(text))
     
     def _clean_price(self, text: str) -> float:
         """Clean and convert text to float (for prices)"""
         try:
             # Remove currency symbols, commas
-            cleaned = re.sub(r'[,\s₹₨]', '', text)
+            cleaned = _NUMBER_NOISE_RE.sub('', text)
             return float(cleaned)
         except (ValueError, AttributeError):
             return 0.0
@@ -248,7 +251,7 @@ Return ONLY the JSON array, no other text."""
             
             # Extract JSON from response
             import json
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
+            json_match = _JSON_ARRAY_RE.search(content)
             if json_match:
                 holdings = json.loads(json_match.group())
                 return {
@@ -275,14 +278,41 @@ Return ONLY the JSON array, no other text."""
         """
         Use Gemini AI Vision API to extract holdings from image
         Falls back to OCR if Gemini fails
+        
+        OCR runs in a background thread while the Gemini request is in flight,
+        so the fallback result is usually ready by the time Gemini fails.
         """
         if not gemini_api_key:
             logger.info("No Gemini API key provided, using OCR extraction")
             return self.extract_holdings_from_image(image_path)
         
+        executor = None
+        ocr_future = None
+        if self.ocr_available:
+            executor = ThreadPoolExecutor(max_workers=1)
+            ocr_future = executor.submit(self.extract_holdings_from_image, image_path)
+        
         try:
-            return self.extract_with_gemini(image_path, gemini_api_key)
-        except Exception as e:
-            logger.error(f"Error with Gemini extraction: {str(e)}")
+            try:
+                result = self.extract_with_gemini(image_path, gemini_api_key)
+            except Exception as e:
+                logger.error(f"Error with Gemini extraction: {str(e)}")
+                result = {
+                    'success': False,
+                    'error': f"Gemini extraction failed: {str(e)}",
+                    'holdings': []
+                }
+            
+            if result.get('success') or ocr_future is None:
+                return result
+            
             logger.info("Falling back to OCR extraction")
-            return self.extract_holdings_from_image(image_path)
+            ocr_result = ocr_future.result()
+            if not ocr_result.get('success'):
+                return result
+            ocr_result['method'] = 'ocr'
+            return ocr_result
+        finally:
+            if executor is not None:
+                # Don't block a successful Gemini response on the OCR thread
+                executor.shutdown(wait=False)
@@ -7,11 +7,23 @@ import json
 import re
 from decimal import Decimal
 from datetime import datetime, date
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Type
+import itertools
 import logging
 
+try:
+    import ijson
+except ImportError:  # Optional: without it JSON imports are loaded in one piece
+    ijson = None
+
 logger = logging.getLogger(__name__)
 
+# Signed decimal numbers with an optional exponent ('+7', '-1.5', '1e3'), checked
+# before conversion so malformed cells don't raise
+_DECIMAL_RE = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?')
+
+JSON_DECODE_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson else ())
+
 
 class PortfolioImporter:
     """Import portfolio holdings from various sources"""
@@ -68,22 +80,54 @@ class PortfolioImporter:
         }
     }
     
+    # Lower-cased required columns per broker, for header matching
+    _REQUIRED_COLUMNS = {
+        broker: frozenset(col.lower() for col in format_info['required_columns'])
+        for broker, format_info in BROKER_FORMATS.items()
+    }
+    
+    # Candidate CSV columns for each holding field, in order of preference
+    FIELD_COLUMNS = {
+        'symbol': ['tradingsymbol', 'symbol', 'stock_symbol', 'scripname', 'scrip'],
+        'quantity': ['quantity', 'qty', 'netqty', 'net_qty'],
+        'avg_price': ['average_price', 'avg_price', 'avgprice', 'buy_avg_price', 'price'],
+        'purchase_date': ['purchase_date', 'buy_date', 'buydate', 'date'],
+    }
+    
+    # Exchange suffixes stripped from symbols (after any -EQ series suffix)
+    EXCHANGE_SUFFIXES = ('.NS', '.BO')
+    
+    # Strips thousands separators from numeric cells
+    _COMMA_TRANS = str.maketrans('', '', ',')
+    
+    # Non-ISO date formats seen in broker exports, in order of preference
+    DATE_FORMATS = [
+        '%d-%m-%Y',
+        '%d/%m/%Y',
+        '%Y/%m/%d',
+        '%d-%b-%Y',
+        '%d %b %Y',
+    ]
+    
+    # Keys of a JSON object that may hold the holdings list, in order of preference
+    JSON_HOLDINGS_KEYS = ('holdings', 'positions', 'data')
+    
     def __init__(self):
         self.errors = []
         self.warnings = []
         self.success_count = 0
         self.skip_count = 0
+        self._last_date_format = None
     
     def detect_broker_format(self, csv_content: str) -> str:
         """Detect broker format from CSV headers"""
         try:
             reader = csv.DictReader(io.StringIO(csv_content))
-            headers = [h.lower().strip() for h in reader.fieldnames]
+            headers = {h.lower().strip() for h in reader.fieldnames}
             
             # Check for each broker format
-            for broker, format_info in self.BROKER_FORMATS.items():
-                required_cols = [col.lower() for col in format_info['required_columns']]
-                if all(col in headers for col in required_cols):
+            for broker, required_cols in self._REQUIRED_COLUMNS.items():
+                if required_cols <= headers:
                     return broker
             
             return 'generic'
@@ -103,15 +147,23 @@ class PortfolioImporter:
             format_info = self.BROKER_FORMATS.get(broker, self.BROKER_FORMATS['generic'])
             column_mapping = format_info['column_mapping']
             
-            reader = csv.DictReader(io.StringIO(csv_content))
+            reader = csv.reader(io.StringIO(csv_content))
+            header = next(reader, None)
+            if not header:
+                return holdings
             
-            for row_num, row in enumerate(reader, start=2):  # Start from 2 (1 is header)
+            # Resolve which columns hold each field once; rows are then read by position
+            col_idx = {h.lower().strip(): i for i, h in enumerate(header)}
+            field_idx = {
+                field: [col_idx[col] for col in candidates if col in col_idx]
+                for field, candidates in self.FIELD_COLUMNS.items()
+            }
+            
+            rows = (row for row in reader if row)  # Skip blank lines like DictReader
+            for row_num, row in enumerate(rows, start=2):  # Start from 2 (1 is header)
                 try:
-                    # Convert keys to lowercase for case-insensitive matching
-                    row_lower = {k.lower().strip(): v.strip() for k, v in row.items() if v}
-                    
                     # Extract data using column mapping
-                    holding_data = self._extract_holding_data(row_lower, column_mapping, broker)
+                    holding_data = self._extract_holding_data(row, field_idx, column_mapping, broker)
                     
                     if holding_data:
                         holding_data['row_number'] = row_num
@@ -132,15 +184,16 @@ class PortfolioImporter:
         
         return holdings
     
-    def _extract_holding_data(self, row: Dict, column_mapping: Dict, broker: str) -> Dict:
+    def _extract_holding_data(self, row: List[str], field_idx: Dict[str, List[int]], column_mapping: Dict, broker: str) -> Dict:
         """Extract holding data from a CSV row"""
         holding = {}
         
         # Extract symbol
         symbol = None
-        for source_col in ['tradingsymbol', 'symbol', 'stock_symbol', 'scripname', 'scrip']:
-            if source_col in row:
-                symbol = self._clean_symbol(row[source_col])
+        for idx in field_idx['symbol']:
+            value = self._get_cell(row, idx)
+            if value is not None:
+                symbol = self._clean_symbol(value)
                 break
         
         if not symbol:
@@ -148,35 +201,38 @@ class PortfolioImporter:
         
         # Extract quantity
         quantity = None
-        for qty_col in ['quantity', 'qty', 'netqty', 'net_qty']:
-            if qty_col in row:
-                try:
-                    quantity = int(float(row[qty_col]))
-                    break
-                except (ValueError, TypeError):
-                    continue
+        for idx in field_idx['quantity']:
+            value = self._get_cell(row, idx)
+            if value is not None and _DECIMAL_RE.fullmatch(value):
+                quantity = int(float(value))
+                break
         
         if not quantity or quantity <= 0:
             return None
         
         # Extract average price
         avg_price = None
-        for price_col in ['average_price', 'avg_price', 'avgprice', 'buy_avg_price', 'price']:
-            if price_col in row:
-                try:
-                    avg_price = Decimal(str(row[price_col]).replace(',', ''))
+        invalid_price = None
+        for idx in field_idx['avg_price']:
+            value = self._get_cell(row, idx)
+            if value is not None:
+                value = value.translate(self._COMMA_TRANS)
+                if _DECIMAL_RE.fullmatch(value):
+                    avg_price = Decimal(value)
                     break
-                except (ValueError, TypeError, Decimal.InvalidOperation):
-                    continue
+                invalid_price = invalid_price or value
         
+        if avg_price is None and invalid_price is not None:
+            raise ValueError(f"Invalid average price '{invalid_price}'")
         if not avg_price or avg_price <= 0:
             return None
         
         # Extract purchase date (optional)
         purchase_date = None
-        for date_col in ['purchase_date', 'buy_date', 'buydate', 'date']:
-            if date_col in row and row[date_col]:
-                purchase_date = self._parse_date(row[date_col])
+        for idx in field_idx['purchase_date']:
+            value = self._get_cell(row, idx)
+            if value is not None:
+                purchase_date = self._parse_date(value)
                 break
         
         if not purchase_date:
@@ -192,49 +248,74 @@ class PortfolioImporter:
         
         return holding
     
+    def _get_cell(self, row: List[str], idx: int) -> str:
+        """Return the stripped value of a column, or None if absent or empty"""
+        if idx >= len(row):
+            return None
+        return row[idx].strip() or None
+    
     def _clean_symbol(self, symbol: str) -> str:
         """Clean and normalize stock symbol"""
         # Remove common suffixes
         symbol = symbol.upper().strip()
-        symbol = re.sub(r'[-_\s]EQ$', '', symbol)  # Remove -EQ suffix
-        symbol = re.sub(r'\.NS$|\.BO$', '', symbol)  # Remove NSE/BSE suffixes
+        if symbol.endswith('EQ') and len(symbol) > 2 and (symbol[-3] in '-_' or symbol[-3].isspace()):
+            symbol = symbol[:-3]  # Remove -EQ suffix
+        for suffix in self.EXCHANGE_SUFFIXES:
+            if symbol.endswith(suffix):
+                symbol = symbol[:-len(suffix)]  # Remove NSE/BSE suffixes
+                break
         return symbol
     
     def _parse_date(self, date_string: str) -> date:
         """Parse date from various formats"""
-        date_formats = [
-            '%Y-%m-%d',
-            '%d-%m-%Y',
-            '%d/%m/%Y',
-            '%Y/%m/%d',
-            '%d-%b-%Y',
-            '%d %b %Y',
-            '%Y%m%d'
-        ]
+        try:
+            date_string = date_string.strip()
+        except AttributeError:
+            return date.today()
         
-        for fmt in date_formats:
+        # Fast path: ISO dates (YYYY-MM-DD / YYYYMMDD) are what most exports use
+        try:
+            return date.fromisoformat(date_string)
+        except ValueError:
+            pass
+        
+        # A file normally uses one date format throughout, so try the last one that matched first
+        if self._last_date_format:
+            try:
+                return datetime.strptime(date_string, self._last_date_format).date()
+            except ValueError:
+                pass
+        
+        for fmt in self.DATE_FORMATS:
             try:
-                return datetime.strptime(date_string.strip(), fmt).date()
-            except (ValueError, AttributeError):
+                parsed = datetime.strptime(date_string, fmt).date()
+            except ValueError:
                 continue
+            self._last_date_format = fmt
+            return parsed
         
         # If no format matches, return today
         return date.today()
     
     def parse_json(self, json_content: str) -> List[Dict]:
         """Parse JSON format portfolio data"""
+        return self.parse_json_stream(io.BytesIO(json_content.encode('utf-8')))
+    
+    def parse_json_stream(self, fp) -> List[Dict]:
+        """
+        Parse JSON format portfolio data from a file-like object
+        
+        With ijson installed the document is decoded one holding at a time,
+        so large broker exports are never held in memory as a whole. Holdings
+        are only returned once the whole document has parsed; a truncated or
+        malformed file yields none.
+        """
         holdings = []
+        counts = (self.success_count, self.skip_count)
         
         try:
-            data = json.loads(json_content)
-            
-            # Handle different JSON structures
-            if isinstance(data, list):
-                items = data
-            elif isinstance(data, dict):
-                # Try common keys
-                items = data.get('holdings', data.get('positions', data.get('data', [])))
-            else:
+            items = self._iter_json_items(fp)
+            if items is None:
                 self.errors.append("Invalid JSON structure")
                 return []
             
@@ -258,13 +339,73 @@ class PortfolioImporter:
                     self.errors.append(f"Item {idx}: {str(e)}")
                     continue
             
-        except json.JSONDecodeError as e:
+        except JSON_DECODE_ERRORS as e:
             self.errors.append(f"Invalid JSON format: {str(e)}")
+            self.success_count, self.skip_count = counts
+            return []
         except Exception as e:
             self.errors.append(f"JSON parsing error: {str(e)}")
+            self.success_count, self.skip_count = counts
+            return []
         
         return holdings
     
+    def _iter_json_items(self, fp):
+        """Return an iterator over the holding items in a JSON document, or None if unsupported"""
+        if ijson is None:
+            data = json.load(fp)
+            
+            # Handle different JSON structures
+            if isinstance(data, list):
+                return iter(data)
+            if isinstance(data, dict):
+                # Try common keys
+                key = next((key for key in self.JSON_HOLDINGS_KEYS if key in data), None)
+                if key is None:
+                    return iter([])
+                if not isinstance(data[key], list):
+                    raise TypeError(f"'{key}' is not a list")
+                return iter(data[key])
+            return None
+        
+        start = self._peek_json_start(fp)
+        if start == '[':
+            return ijson.items(fp, 'item')
+        if start != '{':
+            return None
+        
+        # Try common keys, keeping the first that has any items
+        for key in self.JSON_HOLDINGS_KEYS:
+            fp.seek(0)
+            items = ijson.items(fp, f'{key}.item')
+            first = next(items, None)
+            if first is not None:
+                return itertools.chain([first], items)
+        
+        # None has items: an empty list is fine, anything else isn't holdings
+        fp.seek(0)
+        first_events = {}
+        for prefix, event, _ in ijson.parse(fp):
+            if prefix in self.JSON_HOLDINGS_KEYS:
+                first_events.setdefault(prefix, event)
+        key = next((key for key in self.JSON_HOLDINGS_KEYS if key in first_events), None)
+        if key is not None and first_events[key] != 'start_array':
+            raise TypeError(f"'{key}' is not a list")
+        return iter([])
+    
+    def _peek_json_start(self, fp) -> str:
+        """Return the first non-whitespace character of a JSON stream and rewind it"""
+        start = ''
+        while True:
+            char = fp.read(1)
+            if isinstance(char, bytes):
+                char = char.decode('latin-1')
+            if not char or not char.isspace():
+                start = char
+                break
+        fp.seek(0)
+        return start
+    
     def get_import_summary(self) -> Dict:
         """Get summary of import operation"""
         return {
@@ -282,6 +423,11 @@ class BrokerAPIConnector:
     
     SUPPORTED_BROKERS = ['zerodha', 'groww', 'upstox', 'angelone']
     
+    # Broker API clients keyed by lowercase broker name, filled in as integrations land.
+    # A client is constructed with (api_key, access_token) and implements fetch_holdings()
+    # and get_authorization_url().
+    _HANDLERS: Dict[str, Type] = {}
+    
     def __init__(self, broker: str, api_key: str = None, access_token: str = None):
         self.broker = broker.lower()
         self.api_key = api_key
@@ -290,13 +436,22 @@ class BrokerAPIConnector:
         if self.broker not in self.SUPPORTED_BROKERS:
             raise ValueError(f"Unsupported broker: {broker}")
     
+    @classmethod
+    def register_handler(cls, broker: str, handler_cls: Type) -> None:
+        """Register the API client class used for a broker"""
+        cls._HANDLERS[broker.lower()] = handler_cls
+    
+    def _get_client(self, feature: str):
+        """Instantiate the registered client for this broker"""
+        handler_cls = self._HANDLERS.get(self.broker)
+        if handler_cls is None:
+            raise NotImplementedError(f"{feature} for {self.broker} coming soon")
+        return handler_cls(self.api_key, self.access_token)
+    
     def fetch_holdings(self) -> List[Dict]:
         """Fetch holdings from broker API"""
-        # This would be implemented for each broker's API
-        # For now, return placeholder
-        raise NotImplementedError(f"API integration for {self.broker} coming soon")
+        return self._get_client('API integration').fetch_holdings()
     
     def get_authorization_url(self) -> str:
         """Get OAuth authorization URL for broker"""
-        # Implementation depends on broker's OAuth flow
-        raise NotImplementedError(f"OAuth for {self.broker} coming soon")
\ No newline at end of file
+        return self._get_client('OAuth').get_authorization_url()
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Price indicator kernel used by the portfolio technical analysis
+"""
+import logging
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # Optional: without it indicators are computed with NumPy slices
+    njit = None
+
+logger = logging.getLogger(__name__)
+
+
+def _indicators_loop(closes, highs, lows):
+    """Single pass over the recent prices; compiled by numba when available"""
+    n = closes.shape[0]
+
+    sum_20 = 0.0
+    sum_50 = 0.0
+    for i in range(max(n - 50, 0), n):
+        sum_50 += closes[i]
+        if i >= n - 20:
+            sum_20 += closes[i]
+    ma_50 = sum_50 / 50 if n >= 50 else np.nan
+
+    high_20 = -np.inf
+    for i in range(max(highs.shape[0] - 20, 0), highs.shape[0]):
+        if highs[i] > high_20:
+            high_20 = highs[i]
+
+    low_20 = np.inf
+    for i in range(max(lows.shape[0] - 20, 0), lows.shape[0]):
+        if lows[i] < low_20:
+            low_20 = lows[i]
+
+    return (
+        sum_20 / 20,
+        ma_50,
+        high_20,
+        low_20,
+        closes[n - 1] / closes[n - 5] - 1,
+        closes[n - 1] / closes[n - 20] - 1,
+    )
+
+
+def _indicators_numpy(closes, highs, lows):
+    """NumPy equivalent of _indicators_loop for when numba isn't installed"""
+    return (
+        closes[-20:].mean(),
+        closes[-50:].mean() if len(closes) >= 50 else np.nan,
+        highs[-20:].max(),
+        lows[-20:].min(),
+        closes[-1] / closes[-5] - 1,
+        closes[-1] / closes[-20] - 1,
+    )
+
+
+if njit is not None:
+    _kernel = njit(cache=True)(_indicators_loop)
+else:
+    _kernel = _indicators_numpy
+
+
+def price_indicators(closes, highs, lows):
+    """
+    20/50-day moving averages, 20-day high/low and 5/20-day price change ratios
+
+    Takes float64 arrays with at least 20 closes and returns plain floats;
+    the 50-day average is None with fewer than 50 closes.
+    """
+    ma_20, ma_50, high_20, low_20, change_5d, change_20d = _kernel(closes, highs, lows)
+    return (
+        float(ma_20),
+        None if np.isnan(ma_50) else float(ma_50),
+        float(high_20),
+        float(low_20),
+        float(change_5d),
+        float(change_20d),
+    )
+
+
+def price_indicators_batch(series):
+    """
+    price_indicators() for many stocks at once
+    
+    Takes a list of (closes, highs, lows) array triples, each with at least 20
+    closes, lays them out right-aligned in NaN-padded matrices and computes
+    every stock's indicators with whole-matrix operations.
+    """
+    n = len(series)
+    closes = np.full((n, 50), np.nan)
+    highs = np.full((n, 20), np.nan)
+    lows = np.full((n, 20), np.nan)
+    for row, (row_closes, row_highs, row_lows) in enumerate(series):
+        row_closes, row_highs, row_lows = row_closes[-50:], row_highs[-20:], row_lows[-20:]
+        closes[row, 50 - len(row_closes):] = row_closes
+        highs[row, 20 - len(row_highs):] = row_highs
+        lows[row, 20 - len(row_lows):] = row_lows
+    
+    with np.errstate(invalid='ignore'):
+        columns = (
+            closes[:, -20:].mean(axis=1),
+            closes.mean(axis=1),  # NaN unless all 50 closes are present
+            np.nanmax(highs, axis=1, initial=-np.inf),
+            np.nanmin(lows, axis=1, initial=np.inf),
+            closes[:, -1] / closes[:, -5] - 1,
+            closes[:, -1] / closes[:, -20] - 1,
+        )
+    return [
+        (
+            float(ma_20),
+            None if np.isnan(ma_50) else float(ma_50),
+            float(high_20),
+            float(low_20),
+            float(change_5d),
+            float(change_20d),
+        )
+        for ma_20, ma_50, high_20, low_20, change_5d, change_20d in zip(*columns)
+    ]
+
+
+def warm_up():
+    """
+    Compile (or load the cached) numba kernel so the first analysis doesn't pay for it
+    
+    Runs at app start-up, so a kernel that fails to compile falls back to the
+    NumPy version instead of stopping the process.
+    """
+    global _kernel
+    if _kernel is _indicators_numpy:
+        return
+    prices = np.ones(20, dtype=np.float64)
+    try:
+        _kernel(prices, prices, prices)
+    except Exception as e:
+        logger.warning(f"numba indicator kernel unavailable, using NumPy instead: {str(e)}")
+        _kernel = _indicators_numpy
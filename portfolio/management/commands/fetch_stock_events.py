@@ -1,7 +1,11 @@
 """
 Management command to fetch stock events for portfolio holdings
 """
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import threading
+
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 from portfolio.models import Holding, InsiderTrade, BulkDeal, BlockDeal, CorporateAction, PromoterHolding
@@ -39,6 +43,12 @@ class Command(BaseCommand):
             default=90,
             help='Number of days to look back for trades'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of stocks to fetch concurrently'
+        )
 
     def handle(self, *args, **options):
         symbol = options['symbol']
@@ -46,231 +56,296 @@ class Command(BaseCommand):
         holdings_only = options['holdings_only']
         days = options['days']
         
-        fetcher = StockEventFetcher()
-        
-        # Determine which stocks to process
+        # Determine which stocks to process. The event fetchers only need the
+        # symbol and primary key, so skip hydrating the other Stock columns
+        stock_fields = Stock.objects.only('id', 'symbol')
         if symbol:
-            stocks = Stock.objects.filter(symbol=symbol)
-            if not stocks.exists():
-                self.stdout.write(self.style.ERROR(f'Stock {symbol} not found'))
-                return
+            stocks = stock_fields.filter(symbol=symbol)
         elif holdings_only:
             # Get all unique stocks from holdings
             stock_ids = Holding.objects.values_list('stock_id', flat=True).distinct()
-            stocks = Stock.objects.filter(id__in=stock_ids)
+            stocks = stock_fields.filter(id__in=stock_ids)
         else:
             # Get all active stocks
-            stocks = Stock.objects.all()[:50]  # Limit to avoid rate limiting
+            stocks = stock_fields.all()[:50]  # Limit to avoid rate limiting
         
-        self.stdout.write(f'Processing {stocks.count()} stocks...')
+        total = stocks.count()
+        if symbol and not total:
+            self.stdout.write(self.style.ERROR(f'Stock {symbol} not found'))
+            return
+        
+        self.stdout.write(f'Processing {total} stocks...')
+        
+        # Stocks are independent and the work is network-bound, so fetch them
+        # concurrently; each worker thread gets its own fetcher (and session)
+        self._local = threading.local()
         
-        for stock in stocks:
-            self.stdout.write(f'\nFetching events for {stock.symbol}...')
+        # Resolve the deal window once so every stock (and both deal types)
+        # use the same dates, even if the run straddles midnight
+        self._deal_range = self._last_week_range()
+        workers = max(1, options['workers'])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Stream stocks from the DB and keep only a bounded number in
+            # flight, so memory doesn't grow with the number of holdings
+            pending = {}
+            for stock in stocks.iterator(chunk_size=200):
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    self._write_results(done, pending)
+                pending[executor.submit(self._process_stock, stock, event_type, days)] = stock
             
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                self._write_results(done, pending)
+        
+        self.stdout.write(self.style.SUCCESS('\n✅ Stock events fetch completed!'))
+    
+    def _write_results(self, done, pending):
+        """Write the output of finished stock futures and drop them from pending"""
+        for future in done:
+            stock = pending.pop(future)
             try:
-                # Fetch insider trades
-                if event_type in ['insider', 'all']:
-                    self._fetch_insider_trades(fetcher, stock, days)
-                
-                # Fetch bulk deals (last 7 days)
-                if event_type in ['bulk', 'all']:
-                    self._fetch_bulk_deals(fetcher, stock)
-                
-                # Fetch block deals (last 7 days)
-                if event_type in ['block', 'all']:
-                    self._fetch_block_deals(fetcher, stock)
-                
-                # Fetch corporate actions
-                if event_type in ['corporate', 'all']:
-                    self._fetch_corporate_actions(fetcher, stock)
-                
-                # Fetch promoter holdings
-                if event_type in ['promoter', 'all']:
-                    self._fetch_promoter_holdings(fetcher, stock)
-                
+                output = future.result()
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'Error processing {stock.symbol}: {str(e)}'))
-                logger.error(f'Error processing {stock.symbol}: {str(e)}')
+                logger.error('Error processing %s: %s', stock.symbol, e)
                 continue
+            
+            # Output is buffered per stock and written from this thread so
+            # messages for different stocks don't interleave
+            for line in output:
+                self.stdout.write(line)
+    
+    def _process_stock(self, stock, event_type, days):
+        """Fetch and save all requested event types for one stock, returning its output lines"""
+        fetcher = getattr(self._local, 'fetcher', None)
+        if fetcher is None:
+            fetcher = self._local.fetcher = StockEventFetcher()
+        self._local.output = []
         
-        self.stdout.write(self.style.SUCCESS('\n✅ Stock events fetch completed!'))
+        self._write(f'\nFetching events for {stock.symbol}...')
+        
+        try:
+            # Fetch insider trades
+            if event_type in ['insider', 'all']:
+                self._fetch_insider_trades(fetcher, stock, days)
+            
+            # Fetch bulk deals (last 7 days)
+            if event_type in ['bulk', 'all']:
+                self._fetch_bulk_deals(fetcher, stock)
+            
+            # Fetch block deals (last 7 days)
+            if event_type in ['block', 'all']:
+                self._fetch_block_deals(fetcher, stock)
+            
+            # Fetch corporate actions
+            if event_type in ['corporate', 'all']:
+                self._fetch_corporate_actions(fetcher, stock)
+            
+            # Fetch promoter holdings
+            if event_type in ['promoter', 'all']:
+                self._fetch_promoter_holdings(fetcher, stock)
+            
+        except Exception as e:
+            self._write(self.style.ERROR(f'Error processing {stock.symbol}: {str(e)}'))
+            logger.error('Error processing %s: %s', stock.symbol, e)
+        finally:
+            # Worker threads open their own DB connections; don't leak them
+            connection.close()
+        
+        return self._local.output
+    
+    def _write(self, message):
+        """Buffer a line of output for the stock being processed on this thread"""
+        self._local.output.append(message)
+    
+    def _save_new_events(self, model, stock, rows, key_fields, date_field, label):
+        """
+        Insert the rows not already stored for a stock
+        
+        Existing keys are loaded with a single query and new rows are written
+        with one bulk insert, instead of an exists()/create() pair per row.
+        Returns the number of rows inserted.
+        """
+        if not rows:
+            return 0
+        
+        def row_key(values):
+            # Dates come back from the DB as date objects but from the fetcher as ISO strings
+            return tuple(str(value) for value in values)
+        
+        dates = {row.get(date_field) for row in rows if row.get(date_field)}
+        existing = {
+            row_key(values)
+            for values in model.objects.filter(
+                stock=stock, **{f'{date_field}__in': dates}
+            ).values_list(*key_fields)
+        }
+        
+        new_objects = []
+        for row in rows:
+            try:
+                missing = [
+                    name for name, value in row.items()
+                    if value is None and not model._meta.get_field(name).null
+                ]
+                if missing:
+                    raise ValueError(f"missing {', '.join(missing)}")
+                
+                key = row_key(row[field] for field in key_fields)
+                if key in existing:
+                    continue
+                existing.add(key)
+                new_objects.append(model(stock=stock, **row))
+            except Exception as e:
+                logger.error("Error saving %s: %s", label, e)
+                continue
+        
+        if not new_objects:
+            return 0
+        
+        try:
+            with transaction.atomic():
+                model.bulk_ingest(new_objects)
+        except Exception as e:
+            # One bad row (e.g. a value too large for its column) fails the whole
+            # batch; insert the rows one at a time so only the bad ones are lost
+            logger.warning("Bulk save of %ss failed, saving one at a time: %s", label, e)
+            saved = 0
+            for obj in new_objects:
+                try:
+                    with transaction.atomic():
+                        model.bulk_ingest([obj])
+                    saved += 1
+                except Exception as e:
+                    logger.error("Error saving %s: %s", label, e)
+            return saved
+        
+        return len(new_objects)
+    
+    def _last_week_range(self):
+        """Return (from, to) dates in YYYY-MM-DD covering the last 7 days including today"""
+        today = datetime.now()
+        return (today - timedelta(days=6)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
     
     def _fetch_insider_trades(self, fetcher, stock, days):
         """Fetch and save insider trades"""
-        self.stdout.write(f'  📡 Fetching insider trades from NSE API...')
+        self._write(f'  📡 Fetching insider trades from NSE API...')
         trades = fetcher.fetch_insider_trades(stock.symbol, days)
         
         if not trades:
-            self.stdout.write(f'  ℹ️  No insider trades found (or NSE API error)')
+            self._write(f'  ℹ️  No insider trades found (or NSE API error)')
             return
         
-        self.stdout.write(f'  📥 Retrieved {len(trades)} insider trades from NSE')
+        self._write(f'  📥 Retrieved {len(trades)} insider trades from NSE')
         
-        saved_count = 0
-        for trade_data in trades:
-            try:
-                # Check if trade already exists
-                existing = InsiderTrade.objects.filter(
-                    stock=stock,
-                    insider_name=trade_data['insider_name'],
-                    transaction_date=trade_data['transaction_date'],
-                    quantity=trade_data['quantity']
-                ).exists()
-                
-                if not existing:
-                    InsiderTrade.objects.create(
-                        stock=stock,
-                        **trade_data
-                    )
-                    saved_count += 1
-            except Exception as e:
-                logger.error(f"Error saving insider trade: {e}")
-                continue
+        saved_count = self._save_new_events(
+            InsiderTrade, stock, trades,
+            key_fields=('insider_name', 'transaction_date', 'quantity'),
+            date_field='transaction_date',
+            label='insider trade',
+        )
         
         if saved_count > 0:
-            self.stdout.write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new insider trades'))
+            self._write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new insider trades'))
         else:
-            self.stdout.write(f'  ℹ️  All insider trades already in database')
+            self._write(f'  ℹ️  All insider trades already in database')
     
     def _fetch_bulk_deals(self, fetcher, stock):
         """Fetch and save bulk deals for last 7 days"""
-        self.stdout.write(f'  📡 Fetching bulk deals from NSE API (last 7 days)...')
-        saved_count = 0
-        found_count = 0
+        self._write(f'  📡 Fetching bulk deals from NSE API (last 7 days)...')
+        from_date, to_date = self._deal_range
+        deals = fetcher.fetch_bulk_deals_range(stock.symbol, from_date, to_date)
         
-        for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            deals = fetcher.fetch_bulk_deals(stock.symbol, date)
-            found_count += len(deals)
-            
-            for deal_data in deals:
-                try:
-                    existing = BulkDeal.objects.filter(
-                        stock=stock,
-                        client_name=deal_data['client_name'],
-                        deal_date=deal_data['deal_date'],
-                        quantity=deal_data['quantity']
-                    ).exists()
-                    
-                    if not existing:
-                        # Remove symbol from deal_data as it's not a field
-                        deal_data.pop('symbol', None)
-                        BulkDeal.objects.create(
-                            stock=stock,
-                            **deal_data
-                        )
-                        saved_count += 1
-                except Exception as e:
-                    logger.error(f"Error saving bulk deal: {e}")
-                    continue
+        found_count = len(deals)
+        for deal_data in deals:
+            # Remove symbol from deal_data as it's not a field
+            deal_data.pop('symbol', None)
+        
+        saved_count = self._save_new_events(
+            BulkDeal, stock, deals,
+            key_fields=('client_name', 'deal_date', 'quantity'),
+            date_field='deal_date',
+            label='bulk deal',
+        )
         
         if found_count > 0:
-            self.stdout.write(f'  📥 Retrieved {found_count} bulk deals from NSE')
+            self._write(f'  📥 Retrieved {found_count} bulk deals from NSE')
             if saved_count > 0:
-                self.stdout.write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new bulk deals'))
+                self._write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new bulk deals'))
             else:
-                self.stdout.write(f'  ℹ️  All bulk deals already in database')
+                self._write(f'  ℹ️  All bulk deals already in database')
         else:
-            self.stdout.write(f'  ℹ️  No bulk deals found in last 7 days (normal if no large trades)')
+            self._write(f'  ℹ️  No bulk deals found in last 7 days (normal if no large trades)')
     
     def _fetch_block_deals(self, fetcher, stock):
         """Fetch and save block deals for last 7 days"""
-        saved_count = 0
+        from_date, to_date = self._deal_range
+        deals = fetcher.fetch_block_deals_range(stock.symbol, from_date, to_date)
         
-        for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            deals = fetcher.fetch_block_deals(stock.symbol, date)
-            
-            for deal_data in deals:
-                try:
-                    existing = BlockDeal.objects.filter(
-                        stock=stock,
-                        client_name=deal_data['client_name'],
-                        deal_date=deal_data['deal_date'],
-                        quantity=deal_data['quantity']
-                    ).exists()
-                    
-                    if not existing:
-                        deal_data.pop('symbol', None)
-                        BlockDeal.objects.create(
-                            stock=stock,
-                            **deal_data
-                        )
-                        saved_count += 1
-                except Exception as e:
-                    logger.error(f"Error saving block deal: {e}")
-                    continue
+        for deal_data in deals:
+            deal_data.pop('symbol', None)
+        
+        saved_count = self._save_new_events(
+            BlockDeal, stock, deals,
+            key_fields=('client_name', 'deal_date', 'quantity'),
+            date_field='deal_date',
+            label='block deal',
+        )
         
         if saved_count > 0:
-            self.stdout.write(f'  ✅ Saved {saved_count} block deals')
+            self._write(f'  ✅ Saved {saved_count} block deals')
     
     def _fetch_corporate_actions(self, fetcher, stock):
         """Fetch and save corporate actions"""
-        self.stdout.write(f'  📡 Fetching corporate actions from NSE API...')
+        self._write(f'  📡 Fetching corporate actions from NSE API...')
         actions = fetcher.fetch_corporate_actions(stock.symbol)
         
         if not actions:
-            self.stdout.write(f'  ℹ️  No corporate actions found')
+            self._write(f'  ℹ️  No corporate actions found')
             return
         
-        self.stdout.write(f'  📥 Retrieved {len(actions)} corporate actions from NSE')
+        self._write(f'  📥 Retrieved {len(actions)} corporate actions from NSE')
         
-        saved_count = 0
-        for action_data in actions:
-            try:
-                existing = CorporateAction.objects.filter(
-                    stock=stock,
-                    action_type=action_data['action_type'],
-                    announcement_date=action_data['announcement_date']
-                ).exists()
-                
-                if not existing:
-                    CorporateAction.objects.create(
-                        stock=stock,
-                        **action_data
-                    )
-                    saved_count += 1
-            except Exception as e:
-                logger.error(f"Error saving corporate action: {e}")
-                continue
+        saved_count = self._save_new_events(
+            CorporateAction, stock, actions,
+            key_fields=('action_type', 'announcement_date'),
+            date_field='announcement_date',
+            label='corporate action',
+        )
         
         if saved_count > 0:
-            self.stdout.write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new corporate actions'))
+            self._write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new corporate actions'))
         else:
-            self.stdout.write(f'  ℹ️  All corporate actions already in database')
+            self._write(f'  ℹ️  All corporate actions already in database')
     
     def _fetch_promoter_holdings(self, fetcher, stock):
         """Fetch and save promoter holdings"""
-        self.stdout.write(f'  📡 Fetching promoter holdings from NSE API...')
+        self._write(f'  📡 Fetching promoter holdings from NSE API...')
         
         try:
             holdings = fetcher.fetch_promoter_holding(stock.symbol)
         except Exception as e:
-            self.stdout.write(self.style.WARNING(f'  ⚠️  NSE API error: {str(e)}'))
+            self._write(self.style.WARNING(f'  ⚠️  NSE API error: {str(e)}'))
             return
         
         if not holdings:
-            self.stdout.write(f'  ℹ️  No promoter holdings data available (NSE API may be down or rate-limiting)')
+            self._write(f'  ℹ️  No promoter holdings data available (NSE API may be down or rate-limiting)')
             return
         
-        self.stdout.write(f'  📥 Retrieved {len(holdings)} quarters of holding data')
+        self._write(f'  📥 Retrieved {len(holdings)} quarters of holding data')
         
+        # Upsert all quarters in one statement instead of an update_or_create per quarter
         saved_count = 0
-        for holding_data in holdings:
-            try:
-                # Update or create
-                obj, created = PromoterHolding.objects.update_or_create(
-                    stock=stock,
-                    quarter_end_date=holding_data['quarter_end_date'],
-                    defaults=holding_data
-                )
-                if created:
-                    saved_count += 1
-            except Exception as e:
-                logger.error(f"Error saving promoter holding: {e}")
-                continue
+        try:
+            saved_count = PromoterHolding.bulk_upsert(
+                [PromoterHolding(stock=stock, **h) for h in holdings if h.get('quarter_end_date')],
+                fields={field for h in holdings for field in h},
+            )
+        except Exception as e:
+            logger.error("Error saving promoter holdings: %s", e)
         
         if saved_count > 0:
-            self.stdout.write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new promoter holding records'))
+            self._write(self.style.SUCCESS(f'  ✅ Saved {saved_count} new promoter holding records'))
         else:
-            self.stdout.write(f'  ℹ️  All promoter holdings already in database')
+            self._write(f'  ℹ️  All promoter holdings already in database')
@@ -27,20 +27,21 @@ class Command(BaseCommand):
         fetcher = StockPriceFetcher()
         
         # Determine which stocks to update
+        # Stocks are evaluated once up front; the list is reused for counts and the update
         if options['symbols']:
-            stocks = Stock.objects.filter(symbol__in=options['symbols'])
+            stocks = list(Stock.objects.filter(symbol__in=options['symbols']))
             self.stdout.write(f"Updating prices for {len(options['symbols'])} specified stocks...")
         elif options['all']:
-            stocks = Stock.objects.all()
-            self.stdout.write(f"Updating prices for all {stocks.count()} stocks...")
+            stocks = list(Stock.objects.all())
+            self.stdout.write(f"Updating prices for all {len(stocks)} stocks...")
         else:
             # Default: update only stocks in portfolios
             from news.models import PortfolioHolding
             stock_ids = PortfolioHolding.objects.values_list('stock_id', flat=True).distinct()
-            stocks = Stock.objects.filter(id__in=stock_ids)
-            self.stdout.write(f"Updating prices for {stocks.count()} stocks in portfolios...")
+            stocks = list(Stock.objects.filter(id__in=stock_ids))
+            self.stdout.write(f"Updating prices for {len(stocks)} stocks in portfolios...")
         
-        if not stocks.exists():
+        if not stocks:
             self.stdout.write(self.style.WARNING('No stocks found to update'))
             return
         
@@ -56,7 +57,8 @@ class Command(BaseCommand):
         # Show updated stocks with prices
         if result['updated'] > 0:
             self.stdout.write(self.style.SUCCESS(f"\nUpdated Stock Prices:"))
-            for stock in stocks.filter(current_price__isnull=False).order_by('symbol'):
+            # Reuse the instances updated in memory instead of re-querying every Stock column
+            for stock in sorted(result['updated_stocks'], key=lambda s: s.symbol):
                 self.stdout.write(
                     f"  {stock.symbol:15} → ₹{stock.current_price:>10.2f} "
                     f"(updated: {stock.price_updated_at.strftime('%Y-%m-%d %H:%M:%S')})"
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_alter_aiconfig_gemini_model'),
+        ('portfolio', '0003_entryopportunity'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='blockdeal',
+            constraint=models.UniqueConstraint(fields=('stock', 'client_name', 'deal_date', 'quantity'), name='unique_block_deal'),
+        ),
+        migrations.AddConstraint(
+            model_name='bulkdeal',
+            constraint=models.UniqueConstraint(fields=('stock', 'client_name', 'deal_date', 'quantity'), name='unique_bulk_deal'),
+        ),
+        migrations.AddConstraint(
+            model_name='corporateaction',
+            constraint=models.UniqueConstraint(fields=('stock', 'action_type', 'announcement_date'), name='unique_corporate_action'),
+        ),
+        migrations.AddConstraint(
+            model_name='insidertrade',
+            constraint=models.UniqueConstraint(fields=('stock', 'insider_name', 'transaction_date', 'quantity'), name='unique_insider_trade'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_alter_aiconfig_gemini_model'),
+        ('portfolio', '0004_event_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='holding',
+            index=models.Index(fields=['portfolio', '-updated_at'], include=('stock', 'quantity', 'avg_price'), name='holding_port_updated_cov'),
+        ),
+    ]
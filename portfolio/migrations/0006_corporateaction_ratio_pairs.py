@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:47
+
+import re
+
+from django.db import migrations, models
+
+
+RATIO_PREFIXES = ('bonus', 'split', 'rights')
+
+
+def split_ratios(apps, schema_editor):
+    """Parse the old 'a:b' ratio strings into num/den pairs"""
+    CorporateAction = apps.get_model('portfolio', 'CorporateAction')
+    pattern = re.compile(r'(\d+)\s*(?::|for|-)\s*(\d+)')
+
+    updated = []
+    for action in CorporateAction.objects.exclude(bonus_ratio='', split_ratio='', rights_ratio=''):
+        for prefix in RATIO_PREFIXES:
+            match = pattern.search(getattr(action, f'{prefix}_ratio').lower())
+            if match and max(int(match.group(1)), int(match.group(2))) <= 32767:
+                setattr(action, f'{prefix}_num', int(match.group(1)))
+                setattr(action, f'{prefix}_den', int(match.group(2)))
+        updated.append(action)
+
+    fields = [f'{prefix}_{part}' for prefix in RATIO_PREFIXES for part in ('num', 'den')]
+    CorporateAction.objects.bulk_update(updated, fields, batch_size=500)
+
+
+def join_ratios(apps, schema_editor):
+    """Format num/den pairs back into 'a:b' ratio strings"""
+    CorporateAction = apps.get_model('portfolio', 'CorporateAction')
+
+    updated = []
+    for action in CorporateAction.objects.all():
+        for prefix in RATIO_PREFIXES:
+            num, den = getattr(action, f'{prefix}_num'), getattr(action, f'{prefix}_den')
+            if num is not None and den is not None:
+                setattr(action, f'{prefix}_ratio', f"{num}:{den}")
+        updated.append(action)
+
+    CorporateAction.objects.bulk_update(
+        updated, [f'{prefix}_ratio' for prefix in RATIO_PREFIXES], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_holding_port_updated_cov'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='corporateaction',
+            name='bonus_den',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='corporateaction',
+            name='bonus_num',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='corporateaction',
+            name='rights_den',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='corporateaction',
+            name='rights_num',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='corporateaction',
+            name='split_den',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='corporateaction',
+            name='split_num',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(split_ratios, join_ratios),
+        migrations.RemoveField(
+            model_name='corporateaction',
+            name='bonus_ratio',
+        ),
+        migrations.RemoveField(
+            model_name='corporateaction',
+            name='rights_ratio',
+        ),
+        migrations.RemoveField(
+            model_name='corporateaction',
+            name='split_ratio',
+        ),
+    ]
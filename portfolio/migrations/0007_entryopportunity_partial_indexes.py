@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_alter_aiconfig_gemini_model'),
+        ('portfolio', '0006_corporateaction_ratio_pairs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entryopportunity',
+            name='stock',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='entry_opportunities', to='news.stock'),
+        ),
+        migrations.AddIndex(
+            model_name='entryopportunity',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-signal_date'], name='entry_active_signal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entryopportunity',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['stock', '-signal_date'], name='entry_stock_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entryopportunity',
+            index=models.Index(fields=['stock', 'opportunity_type', 'signal_date'], name='entry_stock_type_date_idx'),
+        ),
+    ]
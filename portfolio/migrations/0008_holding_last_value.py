@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:49
+
+from django.db import migrations, models
+
+
+def populate_last_values(apps, schema_editor):
+    """Value existing holdings at their stock's current price (at cost if unpriced)"""
+    Holding = apps.get_model('portfolio', 'Holding')
+    holdings = list(Holding.objects.select_related('stock'))
+    for holding in holdings:
+        holding.last_price = holding.stock.current_price
+        holding.last_value = holding.quantity * (holding.last_price or holding.avg_price)
+    Holding.objects.bulk_update(holdings, ['last_price', 'last_value'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0007_entryopportunity_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holding',
+            name='last_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='holding',
+            name='last_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.RunPython(populate_last_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:52
+
+from django.db import migrations, models
+from django.db.models import F
+
+import portfolio.models
+
+
+# (model, field, null, default) for every percentage column moving to basis points
+PERCENTAGE_FIELDS = [
+    ('promoterholding', 'promoter_holding', False, models.NOT_PROVIDED),
+    ('promoterholding', 'promoter_pledged', False, 0),
+    ('promoterholding', 'public_holding', False, models.NOT_PROVIDED),
+    ('promoterholding', 'fii_holding', True, models.NOT_PROVIDED),
+    ('promoterholding', 'dii_holding', True, models.NOT_PROVIDED),
+    ('shareholdingpattern', 'indian_promoters', False, 0),
+    ('shareholdingpattern', 'foreign_promoters', False, 0),
+    ('shareholdingpattern', 'retail_investors', False, 0),
+    ('shareholdingpattern', 'others', False, 0),
+    ('shareholdingpattern', 'mutual_funds', False, 0),
+    ('shareholdingpattern', 'banks', False, 0),
+    ('shareholdingpattern', 'insurance', False, 0),
+    ('shareholdingpattern', 'fii', False, 0),
+    ('shareholdingpattern', 'dii', False, 0),
+]
+
+
+def _field_kwargs(null, default):
+    kwargs = {'null': null, 'blank': null}
+    if default is not models.NOT_PROVIDED:
+        kwargs['default'] = default
+    return kwargs
+
+
+def _scale(factor):
+    def scale(apps, schema_editor):
+        for model_name, field, _, _ in PERCENTAGE_FIELDS:
+            model = apps.get_model('portfolio', model_name)
+            model.objects.update(**{field: F(field) * factor})
+    return scale
+
+
+def _alter_fields(make_field):
+    return [
+        migrations.AlterField(
+            model_name=model_name,
+            name=field,
+            field=make_field(**_field_kwargs(null, default)),
+        )
+        for model_name, field, null, default in PERCENTAGE_FIELDS
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0008_holding_last_value'),
+    ]
+
+    # Widen the decimal columns so 100% fits once scaled, convert the values
+    # to basis points, then switch the columns to small integers
+    operations = [
+        *_alter_fields(lambda **kwargs: models.DecimalField(max_digits=7, decimal_places=2, **kwargs)),
+        migrations.RunPython(_scale(100), _scale(0.01)),
+        *_alter_fields(portfolio.models.BasisPointsField),
+    ]
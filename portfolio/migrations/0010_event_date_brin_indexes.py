@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:55
+
+from django.db import migrations
+
+
+# (index name, table, column) for the append-mostly event date columns
+BRIN_INDEXES = [
+    ('insider_txn_date_brin', 'portfolio_insidertrade', 'transaction_date'),
+    ('bulk_deal_date_brin', 'portfolio_bulkdeal', 'deal_date'),
+    ('block_deal_date_brin', 'portfolio_blockdeal', 'deal_date'),
+    ('corp_action_ex_date_brin', 'portfolio_corporateaction', 'ex_date'),
+    ('corp_action_ann_date_brin', 'portfolio_corporateaction', 'announcement_date'),
+    ('promoter_quarter_brin', 'portfolio_promoterholding', 'quarter_end_date'),
+]
+
+
+def create_brin_indexes(apps, schema_editor):
+    # BRIN is Postgres-only; other backends keep just the B-tree indexes
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in BRIN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING BRIN ({column}) '
+            f'WITH (pages_per_range = 32)'
+        )
+
+
+def drop_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in BRIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0009_percentages_basis_points'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_brin_indexes, drop_brin_indexes),
+    ]
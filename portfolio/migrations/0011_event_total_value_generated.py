@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-15 22:57
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+def backfill_total_value(apps, schema_editor):
+    """Restore the stored totals when migrating back to plain columns"""
+    for model_name in ('insidertrade', 'bulkdeal', 'blockdeal'):
+        model = apps.get_model('portfolio', model_name)
+        model.objects.update(total_value=models.F('quantity') * models.F('price_per_share'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0010_event_date_brin_indexes'),
+    ]
+
+    # Existing columns can't be altered into generated ones, so they are
+    # dropped and re-added; the database recomputes every row's value
+    operations = [
+        migrations.AlterField(
+            model_name='bulkdeal',
+            name='total_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AlterField(
+            model_name='blockdeal',
+            name='total_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, backfill_total_value),
+        migrations.RemoveField(
+            model_name='insidertrade',
+            name='total_value',
+        ),
+        migrations.AddField(
+            model_name='insidertrade',
+            name='total_value',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('price_per_share')), output_field=models.DecimalField(decimal_places=2, max_digits=18)),
+        ),
+        migrations.RemoveField(
+            model_name='bulkdeal',
+            name='total_value',
+        ),
+        migrations.AddField(
+            model_name='bulkdeal',
+            name='total_value',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('price_per_share')), output_field=models.DecimalField(decimal_places=2, max_digits=18)),
+        ),
+        migrations.RemoveField(
+            model_name='blockdeal',
+            name='total_value',
+        ),
+        migrations.AddField(
+            model_name='blockdeal',
+            name='total_value',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('price_per_share')), output_field=models.DecimalField(decimal_places=2, max_digits=18)),
+        ),
+    ]
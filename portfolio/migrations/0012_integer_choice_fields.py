@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-15 23:02
+
+from django.db import migrations, models
+
+
+# (model, field, [codes]) in the order of their integer values, starting at 1
+CHOICE_FIELDS = [
+    ('insidertrade', 'transaction_type', ['BUY', 'SELL', 'PLEDGE', 'REVOKE']),
+    ('bulkdeal', 'deal_type', ['BUY', 'SELL']),
+    ('blockdeal', 'deal_type', ['BUY', 'SELL']),
+    ('corporateaction', 'action_type', [
+        'DIVIDEND', 'BONUS', 'SPLIT', 'RIGHTS', 'BUYBACK', 'MERGER', 'DELISTING', 'AGM', 'EGM',
+    ]),
+    ('entryopportunity', 'opportunity_type', [
+        'PRICE_DIP', 'ORDER_WIN', 'DIVIDEND', 'EXPANSION', 'SPLIT', 'BONUS',
+    ]),
+    ('entryopportunity', 'signal_strength', ['WEAK', 'MODERATE', 'STRONG']),
+]
+
+
+def codes_to_numbers(apps, schema_editor):
+    """Rewrite the string codes as their integer values while the columns are still text"""
+    for model_name, field, codes in CHOICE_FIELDS:
+        model = apps.get_model('portfolio', model_name)
+        for value, code in enumerate(codes, start=1):
+            model.objects.filter(**{field: code}).update(**{field: str(value)})
+
+
+def numbers_to_codes(apps, schema_editor):
+    """Rewrite the integer values back to string codes after the columns revert to text"""
+    for model_name, field, codes in CHOICE_FIELDS:
+        model = apps.get_model('portfolio', model_name)
+        for value, code in enumerate(codes, start=1):
+            model.objects.filter(**{field: str(value)}).update(**{field: code})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0011_event_total_value_generated'),
+    ]
+
+    operations = [
+        migrations.RunPython(codes_to_numbers, numbers_to_codes),
+        migrations.AlterField(
+            model_name='insidertrade',
+            name='transaction_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Buy'), (2, 'Sell'), (3, 'Pledge'), (4, 'Revoke Pledge')]),
+        ),
+        migrations.AlterField(
+            model_name='bulkdeal',
+            name='deal_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Buy'), (2, 'Sell')]),
+        ),
+        migrations.AlterField(
+            model_name='blockdeal',
+            name='deal_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Buy'), (2, 'Sell')]),
+        ),
+        migrations.AlterField(
+            model_name='corporateaction',
+            name='action_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Dividend'), (2, 'Bonus Issue'), (3, 'Stock Split'), (4, 'Rights Issue'), (5, 'Buyback'), (6, 'Merger/Amalgamation'), (7, 'Delisting'), (8, 'Annual General Meeting'), (9, 'Extraordinary General Meeting')]),
+        ),
+        migrations.AlterField(
+            model_name='entryopportunity',
+            name='opportunity_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Price Dip'), (2, 'New Order'), (3, 'Dividend Announcement'), (4, 'Expansion/Acquisition'), (5, 'Stock Split'), (6, 'Bonus Issue')]),
+        ),
+        migrations.AlterField(
+            model_name='entryopportunity',
+            name='signal_strength',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Weak'), (2, 'Moderate'), (3, 'Strong')], default=2),
+        ),
+    ]
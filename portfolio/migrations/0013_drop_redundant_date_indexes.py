@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-15 23:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0012_integer_choice_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blockdeal',
+            name='portfolio_b_deal_da_dbb493_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='bulkdeal',
+            name='portfolio_b_deal_da_2266b6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='corporateaction',
+            name='portfolio_c_ex_date_bbaf5e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='insidertrade',
+            name='portfolio_i_transac_eb6627_idx',
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-15 23:50
+
+from django.db import migrations, models
+
+
+COVERING_INDEX = models.Index(
+    fields=['portfolio', '-updated_at'],
+    include=['stock', 'quantity', 'avg_price'],
+    name='holding_port_updated_cov',
+)
+
+# Same columns as index keys, for backends without INCLUDE (SQLite, MySQL),
+# which would otherwise create just the (portfolio, -updated_at) part
+COMPOSITE_INDEX = models.Index(
+    fields=['portfolio', '-updated_at', 'stock', 'quantity', 'avg_price'],
+    name='holding_port_updated_cov',
+)
+
+
+def use_composite_index(apps, schema_editor):
+    if schema_editor.connection.features.supports_covering_indexes:
+        return
+    Holding = apps.get_model('portfolio', 'Holding')
+    schema_editor.remove_index(Holding, COVERING_INDEX)
+    schema_editor.add_index(Holding, COMPOSITE_INDEX)
+
+
+def use_covering_index(apps, schema_editor):
+    if schema_editor.connection.features.supports_covering_indexes:
+        return
+    Holding = apps.get_model('portfolio', 'Holding')
+    schema_editor.remove_index(Holding, COMPOSITE_INDEX)
+    schema_editor.add_index(Holding, COVERING_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0013_drop_redundant_date_indexes'),
+    ]
+
+    # The index stays in the database but leaves the model state, so the
+    # system checks don't warn that SQLite ignores its INCLUDE columns
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='holding', name='holding_port_updated_cov'),
+            ],
+        ),
+        migrations.RunPython(use_composite_index, use_covering_index),
+    ]
@@ -1,10 +1,97 @@
 """
 Portfolio models for tracking holdings and related stock events
 """
+import re
+from decimal import Decimal
+
+from django import forms
+from django.core import exceptions
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, Lag, NullIf
 from django.utils import timezone
 
 
+RATIO_RE = re.compile(r'(\d+)\s*(?::|for|-)\s*(\d+)', re.IGNORECASE)
+
+
+def parse_ratio(text):
+    """Parse a ratio such as '1:2', '1 for 2' or '2-for-1' into (num, den), or (None, None)"""
+    match = RATIO_RE.search(text or '')
+    if not match:
+        return None, None
+    num, den = int(match.group(1)), int(match.group(2))
+    if num > 32767 or den > 32767:  # PositiveSmallIntegerField range
+        return None, None
+    return num, den
+
+
+class BasisPointsField(models.SmallIntegerField):
+    """
+    Percentage stored as integer basis points (52.35% is stored as 5235)
+    
+    Model attributes and filters use percentages, loaded as floats rather
+    than Decimal objects. Aggregates and expressions such as F('a') - F('b')
+    work on the stored basis points: wrap them in as_percentage() to get
+    percentages back.
+    """
+    default_validators = [MinValueValidator(0), MaxValueValidator(100)]
+    
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return value / 100
+    
+    def to_python(self, value):
+        if value is None or isinstance(value, float):
+            return value
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+    
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return round(float(value) * 100)
+    
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'max_digits': 5,
+            'decimal_places': 2,
+            'min_value': 0,
+            'max_value': 100,
+            **kwargs,
+        })
+
+
+def as_percentage(expression):
+    """Return an aggregate or expression over BasisPointsField columns as a percentage"""
+    return ExpressionWrapper(expression / 100.0, output_field=models.FloatField())
+
+
+def _ratio_property(prefix):
+    """Expose a {prefix}_num/{prefix}_den pair as an 'a:b' string"""
+    num_attr, den_attr = f'{prefix}_num', f'{prefix}_den'
+    
+    def getter(self):
+        num, den = getattr(self, num_attr), getattr(self, den_attr)
+        if num is None or den is None:
+            return ''
+        return f"{num}:{den}"
+    
+    def setter(self, value):
+        num, den = parse_ratio(value)
+        setattr(self, num_attr, num)
+        setattr(self, den_attr, den)
+    
+    return property(getter, setter)
+
+
 class Portfolio(models.Model):
     """User's portfolio containing multiple holdings"""
     name = models.CharField(max_length=200, default="My Portfolio")
@@ -15,17 +102,121 @@ class Portfolio(models.Model):
     def __str__(self):
         return self.name
     
+    def summary(self):
+        """
+        Total investment and current value of all holdings, computed in one query
+        
+        Reads each holding's denormalized last_value, so no join to Stock is
+        needed; holdings without a price are valued at cost, as in
+        Holding.current_value(). The result is cached on the instance.
+        """
+        if not hasattr(self, '_summary'):
+            output_field = models.DecimalField(max_digits=20, decimal_places=2)
+            investment = F('quantity') * F('avg_price')
+            totals = self.holdings.aggregate(
+                investment=Sum(investment, output_field=output_field),
+                value=Sum(Coalesce('last_value', investment), output_field=output_field),
+            )
+            self._summary = {
+                'total_investment': totals['investment'] or Decimal('0'),
+                'total_value': totals['value'] or Decimal('0'),
+            }
+        return self._summary
+    
+    def clear_summary_cache(self):
+        """Drop the cached summary so the next total is recomputed"""
+        self.__dict__.pop('_summary', None)
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.clear_summary_cache()
+    
+    def valued_holdings(self):
+        """Holdings with their stocks loaded, for per-holding valuation"""
+        # Only the columns Holding's valuation methods (and __str__) read
+        return self.holdings.with_stock().only(
+            'portfolio_id', 'stock_id', 'quantity', 'avg_price',
+            'stock__symbol', 'stock__current_price',
+        )
+    
     def total_value(self):
         """Calculate total portfolio value"""
-        return sum(holding.current_value() for holding in self.holdings.all())
+        return self.summary()['total_value']
     
     def total_investment(self):
         """Calculate total investment"""
-        return sum(holding.total_investment() for holding in self.holdings.all())
+        return self.summary()['total_investment']
     
     def total_pnl(self):
         """Calculate total profit/loss"""
-        return self.total_value() - self.total_investment()
+        summary = self.summary()
+        return summary['total_value'] - summary['total_investment']
+
+
+# Holding fields that last_price/last_value are derived from
+VALUATION_FIELDS = frozenset({'stock', 'stock_id', 'quantity', 'avg_price'})
+
+
+class HoldingQuerySet(models.QuerySet):
+    """QuerySet helpers for holdings"""
+    
+    def with_stock(self):
+        """Join the stock so current_value()/pnl() don't query it per holding"""
+        return self.select_related('stock')
+    
+    def with_financials(self):
+        """
+        Annotate each holding with its investment, market value and P&L computed in SQL
+        
+        Adds investment_amount, market_value, pnl_amount and pnl_pct; Holding's
+        financial methods use them instead of recomputing in Python.
+        """
+        output_field = models.DecimalField(max_digits=20, decimal_places=2)
+        investment = ExpressionWrapper(F('quantity') * F('avg_price'), output_field=output_field)
+        return self.with_stock().annotate(
+            investment_amount=investment,
+            market_value=Coalesce(
+                ExpressionWrapper(
+                    F('quantity') * NullIf('stock__current_price', 0), output_field=output_field
+                ),
+                investment,
+            ),
+        ).annotate(
+            pnl_amount=ExpressionWrapper(
+                F('market_value') - F('investment_amount'), output_field=output_field
+            ),
+            pnl_pct=Case(
+                When(
+                    investment_amount__gt=0,
+                    then=ExpressionWrapper(
+                        (F('market_value') - F('investment_amount')) * Value(100) / F('investment_amount'),
+                        output_field=models.DecimalField(max_digits=20, decimal_places=4),
+                    ),
+                ),
+                default=Value(0),
+                output_field=models.DecimalField(max_digits=20, decimal_places=4),
+            ),
+        )
+    
+    def refresh_last_values(self):
+        """
+        Revalue the holdings at their stocks' current prices (at cost if unpriced) in one UPDATE
+        
+        For stock prices written without save(), e.g. by bulk_update(), which
+        skips the post_save signal that normally does this.
+        """
+        price = Subquery(
+            self.model._meta.get_field('stock').related_model.objects
+            .filter(pk=OuterRef('stock_id'))
+            .values('current_price')[:1]
+        )
+        return self.update(
+            last_price=price,
+            last_value=ExpressionWrapper(
+                F('quantity') * Coalesce(NullIf(price, 0), F('avg_price')),
+                output_field=models.DecimalField(max_digits=20, decimal_places=2),
+            ),
+        )
 
 
 class Holding(models.Model):
@@ -39,51 +230,179 @@ class Holding(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True)
     
+    # Denormalized from the stock's current price (see save() and portfolio.signals) so
+    # portfolio totals can be summed without joining Stock
+    last_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    last_value = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    
+    objects = HoldingQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-updated_at']
         unique_together = ['portfolio', 'stock']
+        # holding_port_updated_cov, covering "a portfolio's holdings, newest
+        # first" plus the valuation columns, is created by migrations 0005 and
+        # 0014 since its form depends on the database backend
     
     def __str__(self):
         return f"{self.stock.symbol} - {self.quantity} shares"
     
+    def save(self, *args, **kwargs):
+        """
+        Value the holding at its stock's current price whenever its valuation inputs are saved
+        
+        Saves limited by update_fields to other columns skip the revaluation
+        (and the stock lookup it needs); otherwise last_price/last_value are
+        added to the fields written.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.refresh_last_value()
+        elif VALUATION_FIELDS.intersection(update_fields):
+            self.refresh_last_value()
+            kwargs['update_fields'] = {*update_fields, 'last_price', 'last_value'}
+        super().save(*args, **kwargs)
+    
+    def refresh_last_value(self):
+        """Copy the stock's current price onto last_price/last_value (at cost if unpriced)"""
+        self.last_price = self.stock.current_price
+        self.last_value = self.quantity * (self.last_price or self.avg_price)
+    
+    def _totals(self):
+        """
+        Investment, value and P&L figures, computed once per instance
+        
+        The cache is keyed on the inputs, so edits to quantity, price or the
+        stock's current price are picked up on the next call.
+        """
+        current_price = self.stock.current_price
+        key = (self.quantity, self.avg_price, current_price)
+        cached = getattr(self, '_cached_totals', None)
+        if cached is None and hasattr(self, 'market_value'):
+            # Loaded via HoldingQuerySet.with_financials(); use the SQL figures
+            cached = self._cached_totals = {
+                'key': key,
+                'total_investment': self.investment_amount,
+                'current_value': self.market_value,
+                'pnl': self.pnl_amount,
+                'pnl_percentage': self.pnl_pct,
+            }
+        if cached is None or cached['key'] != key:
+            investment = self.quantity * self.avg_price
+            if current_price:
+                value = self.quantity * current_price
+            else:
+                value = investment
+            pnl = value - investment
+            cached = self._cached_totals = {
+                'key': key,
+                'total_investment': investment,
+                'current_value': value,
+                'pnl': pnl,
+                'pnl_percentage': (pnl / investment) * 100 if investment > 0 else Decimal('0'),
+            }
+        return cached
+    
     def total_investment(self):
         """Calculate total investment amount"""
-        return float(self.quantity * self.avg_price)
+        return self._totals()['total_investment']
     
     def current_value(self):
         """Calculate current market value"""
-        if self.stock.current_price:
-            return float(self.quantity * self.stock.current_price)
-        return self.total_investment()
+        return self._totals()['current_value']
     
     def pnl(self):
         """Calculate profit/loss"""
-        return self.current_value() - self.total_investment()
+        return self._totals()['pnl']
     
     def pnl_percentage(self):
         """Calculate profit/loss percentage"""
-        investment = self.total_investment()
-        if investment > 0:
-            return (self.pnl() / investment) * 100
-        return 0
+        return self._totals()['pnl_percentage']
+
+
+class StockEventMixin:
+    """Set-oriented reads and writes for event models fed by the NSE fetchers"""
+    
+    @classmethod
+    def bulk_ingest(cls, objs, batch_size=1000):
+        """
+        Insert objects in batches, skipping rows that violate a unique constraint
+        
+        Relies on each model's natural-key constraint for de-duplication.
+        """
+        return cls.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+    
+    @classmethod
+    def stream_by_stock(cls, stock, chunk_size=2000):
+        """Iterate a stock's full event history in chunks instead of loading it all at once"""
+        return cls.objects.filter(stock=stock).iterator(chunk_size=chunk_size)
+
+
+class QuarterlyDataMixin:
+    """Upserts for per-stock quarterly data keyed on (stock, quarter_end_date)"""
+    
+    UNIQUE_FIELDS = ['stock', 'quarter_end_date']
+    
+    @classmethod
+    def bulk_upsert(cls, objs, fields=None, batch_size=500):
+        """
+        Insert new quarters and update existing ones with INSERT ... ON CONFLICT DO UPDATE
+        
+        Only the given fields (all data fields by default) are overwritten on
+        conflict; a later duplicate quarter in objs wins. Returns the number of
+        quarters that weren't stored before.
+        """
+        by_key = {(obj.stock_id, str(obj.quarter_end_date)): obj for obj in objs}
+        if not by_key:
+            return 0
+        
+        existing = {
+            (stock_id, str(quarter))
+            for stock_id, quarter in cls.objects.filter(
+                stock_id__in={stock_id for stock_id, _ in by_key},
+                quarter_end_date__in={quarter for _, quarter in by_key},
+            ).values_list('stock_id', 'quarter_end_date')
+        }
+        
+        data_fields = [
+            field for field in cls._meta.concrete_fields
+            if not field.primary_key and field.name not in cls.UNIQUE_FIELDS
+            and not getattr(field, 'auto_now_add', False)
+        ]
+        update_fields = {
+            field.name for field in data_fields
+            if fields is None or field.name in fields or getattr(field, 'auto_now', False)
+        }
+        cls.objects.bulk_create(
+            list(by_key.values()),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=cls.UNIQUE_FIELDS,
+            update_fields=sorted(update_fields),
+        )
+        return len(by_key.keys() - existing)
 
 
-class InsiderTrade(models.Model):
+class InsiderTrade(StockEventMixin, models.Model):
     """Insider trading information"""
-    TRANSACTION_TYPES = [
-        ('BUY', 'Buy'),
-        ('SELL', 'Sell'),
-        ('PLEDGE', 'Pledge'),
-        ('REVOKE', 'Revoke Pledge'),
-    ]
+    class TransactionType(models.IntegerChoices):
+        BUY = 1, 'Buy'
+        SELL = 2, 'Sell'
+        PLEDGE = 3, 'Pledge'
+        REVOKE = 4, 'Revoke Pledge'
     
     stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='insider_trades')
     insider_name = models.CharField(max_length=200)
     insider_designation = models.CharField(max_length=200)
-    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
+    transaction_type = models.PositiveSmallIntegerField(choices=TransactionType.choices)
     quantity = models.BigIntegerField()
     price_per_share = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    total_value = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    # Computed and stored by the database whenever quantity or price changes
+    total_value = models.GeneratedField(
+        expression=F('quantity') * F('price_per_share'),
+        output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        db_persist=True,
+    )
     transaction_date = models.DateField()
     intimation_date = models.DateField()
     exchange = models.CharField(max_length=10, default='NSE')  # NSE/BSE
@@ -94,26 +413,35 @@ class InsiderTrade(models.Model):
         ordering = ['-transaction_date', '-intimation_date']
         indexes = [
             models.Index(fields=['stock', '-transaction_date']),
-            models.Index(fields=['-transaction_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stock', 'insider_name', 'transaction_date', 'quantity'],
+                name='unique_insider_trade',
+            ),
         ]
     
     def __str__(self):
-        return f"{self.stock.symbol} - {self.insider_name} {self.transaction_type} {self.quantity}"
+        return f"{self.stock.symbol} - {self.insider_name} {self.get_transaction_type_display()} {self.quantity}"
 
 
-class BulkDeal(models.Model):
+class BulkDeal(StockEventMixin, models.Model):
     """Bulk deal transactions (>0.5% of equity)"""
-    DEAL_TYPES = [
-        ('BUY', 'Buy'),
-        ('SELL', 'Sell'),
-    ]
+    class DealType(models.IntegerChoices):
+        BUY = 1, 'Buy'
+        SELL = 2, 'Sell'
     
     stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='bulk_deals')
     client_name = models.CharField(max_length=200)
-    deal_type = models.CharField(max_length=10, choices=DEAL_TYPES)
+    deal_type = models.PositiveSmallIntegerField(choices=DealType.choices)
     quantity = models.BigIntegerField()
     price_per_share = models.DecimalField(max_digits=10, decimal_places=2)
-    total_value = models.DecimalField(max_digits=15, decimal_places=2)
+    # Computed and stored by the database whenever quantity or price changes
+    total_value = models.GeneratedField(
+        expression=F('quantity') * F('price_per_share'),
+        output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        db_persist=True,
+    )
     deal_date = models.DateField()
     exchange = models.CharField(max_length=10, default='NSE')
     remarks = models.TextField(blank=True)
@@ -123,26 +451,33 @@ class BulkDeal(models.Model):
         ordering = ['-deal_date']
         indexes = [
             models.Index(fields=['stock', '-deal_date']),
-            models.Index(fields=['-deal_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stock', 'client_name', 'deal_date', 'quantity'],
+                name='unique_bulk_deal',
+            ),
         ]
     
     def __str__(self):
-        return f"{self.stock.symbol} - {self.client_name} {self.deal_type} {self.quantity}"
+        return f"{self.stock.symbol} - {self.client_name} {self.get_deal_type_display()} {self.quantity}"
 
 
-class BlockDeal(models.Model):
+class BlockDeal(StockEventMixin, models.Model):
     """Block deal transactions (>10,000 shares or >Rs 10 crore)"""
-    DEAL_TYPES = [
-        ('BUY', 'Buy'),
-        ('SELL', 'Sell'),
-    ]
+    DealType = BulkDeal.DealType
     
     stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='block_deals')
     client_name = models.CharField(max_length=200)
-    deal_type = models.CharField(max_length=10, choices=DEAL_TYPES)
+    deal_type = models.PositiveSmallIntegerField(choices=DealType.choices)
     quantity = models.BigIntegerField()
     price_per_share = models.DecimalField(max_digits=10, decimal_places=2)
-    total_value = models.DecimalField(max_digits=15, decimal_places=2)
+    # Computed and stored by the database whenever quantity or price changes
+    total_value = models.GeneratedField(
+        expression=F('quantity') * F('price_per_share'),
+        output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        db_persist=True,
+    )
     deal_date = models.DateField()
     exchange = models.CharField(max_length=10, default='NSE')
     remarks = models.TextField(blank=True)
@@ -152,29 +487,33 @@ class BlockDeal(models.Model):
         ordering = ['-deal_date']
         indexes = [
             models.Index(fields=['stock', '-deal_date']),
-            models.Index(fields=['-deal_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stock', 'client_name', 'deal_date', 'quantity'],
+                name='unique_block_deal',
+            ),
         ]
     
     def __str__(self):
-        return f"{self.stock.symbol} - {self.client_name} {self.deal_type} {self.quantity}"
+        return f"{self.stock.symbol} - {self.client_name} {self.get_deal_type_display()} {self.quantity}"
 
 
-class CorporateAction(models.Model):
+class CorporateAction(StockEventMixin, models.Model):
     """Corporate actions like dividends, bonuses, splits, etc."""
-    ACTION_TYPES = [
-        ('DIVIDEND', 'Dividend'),
-        ('BONUS', 'Bonus Issue'),
-        ('SPLIT', 'Stock Split'),
-        ('RIGHTS', 'Rights Issue'),
-        ('BUYBACK', 'Buyback'),
-        ('MERGER', 'Merger/Amalgamation'),
-        ('DELISTING', 'Delisting'),
-        ('AGM', 'Annual General Meeting'),
-        ('EGM', 'Extraordinary General Meeting'),
-    ]
+    class ActionType(models.IntegerChoices):
+        DIVIDEND = 1, 'Dividend'
+        BONUS = 2, 'Bonus Issue'
+        SPLIT = 3, 'Stock Split'
+        RIGHTS = 4, 'Rights Issue'
+        BUYBACK = 5, 'Buyback'
+        MERGER = 6, 'Merger/Amalgamation'
+        DELISTING = 7, 'Delisting'
+        AGM = 8, 'Annual General Meeting'
+        EGM = 9, 'Extraordinary General Meeting'
     
     stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='corporate_actions')
-    action_type = models.CharField(max_length=20, choices=ACTION_TYPES)
+    action_type = models.PositiveSmallIntegerField(choices=ActionType.choices)
     description = models.TextField()
     ex_date = models.DateField(null=True, blank=True)
     record_date = models.DateField(null=True, blank=True)
@@ -183,9 +522,14 @@ class CorporateAction(models.Model):
     
     # Specific fields for different action types
     dividend_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    bonus_ratio = models.CharField(max_length=20, blank=True)  # e.g., "1:2" means 1 bonus for 2 held
-    split_ratio = models.CharField(max_length=20, blank=True)  # e.g., "1:10" means 1 split into 10
-    rights_ratio = models.CharField(max_length=20, blank=True)
+    # Ratios are stored as integer pairs, e.g. bonus 1:2 means 1 bonus for 2 held
+    # and split 1:10 means 1 split into 10
+    bonus_num = models.PositiveSmallIntegerField(null=True, blank=True)
+    bonus_den = models.PositiveSmallIntegerField(null=True, blank=True)
+    split_num = models.PositiveSmallIntegerField(null=True, blank=True)
+    split_den = models.PositiveSmallIntegerField(null=True, blank=True)
+    rights_num = models.PositiveSmallIntegerField(null=True, blank=True)
+    rights_den = models.PositiveSmallIntegerField(null=True, blank=True)
     rights_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     remarks = models.TextField(blank=True)
@@ -195,29 +539,52 @@ class CorporateAction(models.Model):
         ordering = ['-ex_date', '-announcement_date']
         indexes = [
             models.Index(fields=['stock', '-ex_date']),
-            models.Index(fields=['-ex_date']),
             models.Index(fields=['action_type']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['stock', 'action_type', 'announcement_date'],
+                name='unique_corporate_action',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.stock.symbol} - {self.get_action_type_display()} - {self.ex_date or self.announcement_date}"
+    
+    bonus_ratio = _ratio_property('bonus')
+    split_ratio = _ratio_property('split')
+    rights_ratio = _ratio_property('rights')
+
 
+class PromoterHoldingQuerySet(models.QuerySet):
+    """QuerySet helpers for promoter holdings"""
+    
+    def with_change(self):
+        """Annotate each quarter with the previous quarter's promoter holding in one pass"""
+        return self.annotate(
+            previous_promoter_holding=Window(
+                expression=Lag('promoter_holding'),
+                partition_by=[F('stock')],
+                order_by=F('quarter_end_date').asc(),
+            )
+        )
 
-class PromoterHolding(models.Model):
+
+class PromoterHolding(QuarterlyDataMixin, models.Model):
     """Promoter shareholding pattern over time"""
     stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='promoter_holdings')
     quarter_end_date = models.DateField()
     
     # Promoter holding percentages
-    promoter_holding = models.DecimalField(max_digits=5, decimal_places=2)
-    promoter_pledged = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    promoter_holding = BasisPointsField()
+    promoter_pledged = BasisPointsField(default=0)
     
     # Public holding
-    public_holding = models.DecimalField(max_digits=5, decimal_places=2)
+    public_holding = BasisPointsField()
     
     # Institutional holdings
-    fii_holding = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
-    dii_holding = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    fii_holding = BasisPointsField(null=True, blank=True)
+    dii_holding = BasisPointsField(null=True, blank=True)
     
     # Number of shareholders
     total_shareholders = models.IntegerField(null=True, blank=True)
@@ -225,21 +592,41 @@ class PromoterHolding(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = PromoterHoldingQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-quarter_end_date']
         unique_together = ['stock', 'quarter_end_date']
         indexes = [
             models.Index(fields=['stock', '-quarter_end_date']),
+            # Latest quarter across all stocks (dashboard freshness check)
             models.Index(fields=['-quarter_end_date']),
         ]
     
     def __str__(self):
         return f"{self.stock.symbol} - Q{self.quarter_end_date} - Promoter: {self.promoter_holding}%"
     
+    @classmethod
+    def history_with_change(cls, stock_ids):
+        """All quarters for several stocks, each carrying its QoQ change, in one query"""
+        # Every quarter of these stocks is in the window, so a missing previous
+        # quarter really means there is none
+        return cls.objects.filter(stock_id__in=stock_ids).with_change().annotate(
+            history_complete=Value(True, output_field=models.BooleanField()),
+        ).order_by('stock_id', '-quarter_end_date')
+    
     def promoter_change(self):
         """Calculate change from previous quarter"""
+        # Set when loaded via PromoterHoldingQuerySet.with_change(); None means the
+        # previous quarter wasn't in that queryset, so look it up
+        previous_holding = getattr(self, 'previous_promoter_holding', None)
+        if previous_holding is not None:
+            return float(self.promoter_holding - previous_holding)
+        if getattr(self, 'history_complete', False):
+            return 0
+        
         previous = PromoterHolding.objects.filter(
-            stock=self.stock,
+            stock_id=self.stock_id,
             quarter_end_date__lt=self.quarter_end_date
         ).first()
         
@@ -248,25 +635,25 @@ class PromoterHolding(models.Model):
         return 0
 
 
-class ShareholdingPattern(models.Model):
+class ShareholdingPattern(StockEventMixin, QuarterlyDataMixin, models.Model):
     """Detailed shareholding pattern by category"""
     stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='shareholding_patterns')
     quarter_end_date = models.DateField()
     
     # Promoter categories
-    indian_promoters = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    foreign_promoters = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    indian_promoters = BasisPointsField(default=0)
+    foreign_promoters = BasisPointsField(default=0)
     
     # Public categories
-    retail_investors = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    others = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    retail_investors = BasisPointsField(default=0)
+    others = BasisPointsField(default=0)
     
     # Institutional
-    mutual_funds = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    banks = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    insurance = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    fii = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    dii = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    mutual_funds = BasisPointsField(default=0)
+    banks = BasisPointsField(default=0)
+    insurance = BasisPointsField(default=0)
+    fii = BasisPointsField(default=0)
+    dii = BasisPointsField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -280,25 +667,25 @@ class ShareholdingPattern(models.Model):
 
 class EntryOpportunity(models.Model):
     """Entry signals for buying stocks"""
-    OPPORTUNITY_TYPES = [
-        ('PRICE_DIP', 'Price Dip'),
-        ('ORDER_WIN', 'New Order'),
-        ('DIVIDEND', 'Dividend Announcement'),
-        ('EXPANSION', 'Expansion/Acquisition'),
-        ('SPLIT', 'Stock Split'),
-        ('BONUS', 'Bonus Issue'),
-    ]
-    
-    SIGNAL_STRENGTH = [
-        ('STRONG', 'Strong'),
-        ('MODERATE', 'Moderate'),
-        ('WEAK', 'Weak'),
-    ]
-    
-    stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='entry_opportunities')
-    opportunity_type = models.CharField(max_length=20, choices=OPPORTUNITY_TYPES)
+    class OpportunityType(models.IntegerChoices):
+        PRICE_DIP = 1, 'Price Dip'
+        ORDER_WIN = 2, 'New Order'
+        DIVIDEND = 3, 'Dividend Announcement'
+        EXPANSION = 4, 'Expansion/Acquisition'
+        SPLIT = 5, 'Stock Split'
+        BONUS = 6, 'Bonus Issue'
+    
+    # Numbered weakest to strongest so ordering by -signal_strength puts strong signals first
+    class SignalStrength(models.IntegerChoices):
+        WEAK = 1, 'Weak'
+        MODERATE = 2, 'Moderate'
+        STRONG = 3, 'Strong'
+    
+    # Indexed by entry_stock_type_date_idx below, which leads with stock
+    stock = models.ForeignKey('news.Stock', on_delete=models.CASCADE, related_name='entry_opportunities', db_index=False)
+    opportunity_type = models.PositiveSmallIntegerField(choices=OpportunityType.choices)
     signal_date = models.DateField()
-    signal_strength = models.CharField(max_length=10, choices=SIGNAL_STRENGTH, default='MODERATE')
+    signal_strength = models.PositiveSmallIntegerField(choices=SignalStrength.choices, default=SignalStrength.MODERATE)
     price_at_signal = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     percentage_change = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     description = models.TextField()
@@ -309,6 +696,13 @@ class EntryOpportunity(models.Model):
     class Meta:
         ordering = ['-signal_date', '-signal_strength']
         verbose_name_plural = 'Entry Opportunities'
+        indexes = [
+            # Active-signal feeds only ever scan live rows
+            models.Index(fields=['-signal_date'], name='entry_active_signal_idx', condition=Q(is_active=True)),
+            models.Index(fields=['stock', '-signal_date'], name='entry_stock_active_idx', condition=Q(is_active=True)),
+            # Duplicate-signal checks by stock, type and recent date
+            models.Index(fields=['stock', 'opportunity_type', 'signal_date'], name='entry_stock_type_date_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.stock.symbol} - {self.get_opportunity_type_display()} ({self.signal_strength})"
+        return f"{self.stock.symbol} - {self.get_opportunity_type_display()} ({self.get_signal_strength_display()})"
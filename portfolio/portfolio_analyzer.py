@@ -2,33 +2,129 @@
 AI-powered portfolio analysis with sentiment, recommendations, and technical analysis
 """
 import logging
+import random
+from types import SimpleNamespace
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests
-from decimal import Decimal
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+from functools import lru_cache
 from django.utils import timezone
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .indicators import price_indicators, price_indicators_batch
 import json
 
 logger = logging.getLogger(__name__)
 
+# How long Yahoo Finance price history is reused while the market is open
+PRICE_CACHE_TIMEOUT = 15 * 60
+
+# Articles listed per stock in the news analysis
+RECENT_ARTICLES_PER_STOCK = 10
+
+
+# Points each recommendation feature adds to the buy and sell scores, in the
+# order score_recommendation() builds its feature vector
+BUY_WEIGHTS = np.array([2, 0, 2, 0, 1, 0, 2, 0, 0])
+SELL_WEIGHTS = np.array([0, 2, 0, 2, 0, 1, 0, 2, 1])
+
+
+@lru_cache(maxsize=1024)
+def score_recommendation(sentiment, trend, patterns, valuation_status, pnl_percent):
+    """
+    Action, confidence, risk level and buy/sell scores for a holding's analysis inputs
+    
+    A pure function of its arguments, so re-analyzing an unchanged holding
+    reuses the earlier result.
+    """
+    features = np.array([
+        sentiment > 0.3,                   # Positive news
+        sentiment < -0.3,                  # Negative news
+        trend == 'UPTREND',
+        trend == 'DOWNTREND',
+        'BULLISH_MOMENTUM' in patterns,
+        'BEARISH_MOMENTUM' in patterns,
+        valuation_status == 'UNDERVALUED',
+        valuation_status == 'OVERVALUED',
+        pnl_percent > 20,                  # Consider booking profits
+    ])
+    buy_score = int(features @ BUY_WEIGHTS)
+    sell_score = int(features @ SELL_WEIGHTS)
+    
+    # A large loss strengthens whichever side already leads
+    if pnl_percent < -10:
+        if buy_score > sell_score:
+            buy_score += 1  # Good opportunity to average
+        else:
+            sell_score += 1  # Cut losses
+    
+    # Determine action
+    if buy_score > sell_score and buy_score >= 4:
+        action = 'BUY'
+        confidence = min(buy_score * 15, 90)
+    elif sell_score > buy_score and sell_score >= 4:
+        action = 'SELL'
+        confidence = min(sell_score * 15, 90)
+    else:
+        action = 'HOLD'
+        confidence = 60
+    
+    # Risk level
+    if trend == 'DOWNTREND' and sentiment < 0:
+        risk_level = 'HIGH'
+    elif trend == 'UPTREND' and sentiment > 0:
+        risk_level = 'LOW'
+    else:
+        risk_level = 'MEDIUM'
+    
+    return action, confidence, risk_level, buy_score, sell_score
+
 
 class PortfolioAnalyzer:
     """Comprehensive portfolio analysis using AI and market data"""
     
-    def __init__(self):
+    def __init__(self, max_workers=8):
         self.gemini_api_key = getattr(settings, 'GEMINI_API_KEY', None)
+        self.max_workers = max_workers
+        
+        # Shared by the worker threads: one keep-alive connection per worker,
+        # with brief retries for dropped connections and Yahoo's 429/5xx responses
+        self._http = requests.Session()
+        self._http.mount('https://', HTTPAdapter(
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                raise_on_status=False,
+            ),
+        ))
     
     def analyze_portfolio(self, holdings_queryset) -> Dict:
         """
         Perform comprehensive analysis on all portfolio holdings
         Returns analysis for each stock with recommendations
+        
+        Holdings are independent and the work is mostly waiting on Yahoo
+        Finance and the database, so they are analyzed concurrently.
         """
+        # Evaluate the queryset once here; worker threads only read the loaded rows
+        holdings = list(holdings_queryset.select_related('stock'))
+        
         results = {
             'analyzed_at': timezone.now(),
             'holdings_analysis': [],
             'portfolio_summary': {
-                'total_holdings': holdings_queryset.count(),
+                'total_holdings': len(holdings),
                 'buy_recommendations': 0,
                 'sell_recommendations': 0,
                 'hold_recommendations': 0,
@@ -38,9 +134,24 @@ class PortfolioAnalyzer:
             }
         }
         
-        for holding in holdings_queryset:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            symbols = {h.stock.symbol for h in holdings}
+            price_data = self._prefetch_price_data(symbols, executor)
+            news = self._recent_news(symbols)
+            indicators = self._batch_indicators(price_data)
+            futures = [
+                (holding, executor.submit(
+                    self._analyze_in_thread, holding,
+                    price_data.get(holding.stock.symbol), news[holding.stock.symbol],
+                    indicators.get(holding.stock.symbol),
+                ))
+                for holding in holdings
+            ]
+        
+        # Collected in holding order so the report doesn't depend on which request finished first
+        for holding, future in futures:
             try:
-                analysis = self.analyze_single_holding(holding)
+                analysis = future.result()
                 results['holdings_analysis'].append(analysis)
                 
                 # Update summary counts
@@ -65,44 +176,78 @@ class PortfolioAnalyzer:
         
         return results
     
-    def analyze_single_holding(self, holding) -> Dict:
-        """Analyze a single stock holding"""
+    def _analyze_in_thread(self, holding, price_data=None, news=None, indicators=None) -> Dict:
+        """Analyze a holding on a worker thread, closing the thread's DB connection afterwards"""
+        try:
+            return self.analyze_single_holding(holding, price_data, news, indicators)
+        finally:
+            connection.close()
+    
+    def analyze_single_holding(self, holding, price_data=None, news=None, indicators=None) -> Dict:
+        """
+        Analyze a single stock holding
+        
+        Already fetched price data and news, and price indicators computed by
+        _batch_indicators(), can be passed in to skip that work here.
+        """
         stock = holding.stock
         
+        # Read the Decimal-backed figures once as floats for the analysis below
+        holding = SimpleNamespace(
+            quantity=holding.quantity,
+            average_price=float(holding.average_price),
+            pnl=float(holding.pnl),
+            pnl_percentage=float(holding.pnl_percentage),
+        )
+        market_price = float(stock.current_price or 0)
+        current_price = market_price or holding.average_price
+        
         # Get market data
-        price_data = self._get_price_data(stock.symbol)
+        if price_data is None:
+            price_data = self._get_price_data(stock.symbol)
         
         # Get news sentiment
-        news_analysis = self._analyze_news(stock.symbol)
-        
-        # Technical analysis
-        technical_analysis = self._technical_analysis(stock.symbol, price_data)
+        news_analysis = self._analyze_news(stock.symbol, news)
         
         # Corporate actions and insider trading
         corporate_info = self._get_corporate_actions(stock.symbol)
         
-        # Valuation assessment
-        valuation = self._assess_valuation(stock, price_data)
-        
-        # Generate AI recommendation
-        ai_recommendation = self._generate_ai_recommendation(
-            stock=stock,
-            holding=holding,
-            price_data=price_data,
-            news_analysis=news_analysis,
-            technical_analysis=technical_analysis,
-            corporate_info=corporate_info,
-            valuation=valuation
-        )
+        if not price_data.get('close'):
+            # Failed fetch (rate limit, unknown symbol): nothing to analyze or score
+            technical_analysis = {'trend': 'UNKNOWN', 'signals': [], 'patterns': []}
+            valuation = {'status': 'UNKNOWN', 'metrics': {}}
+            ai_recommendation = {
+                'action': 'HOLD',
+                'confidence': 0,
+                'reasoning': 'Price history unavailable - no recommendation until market data can be fetched',
+                'risk_level': 'UNKNOWN',
+            }
+        else:
+            # Technical analysis
+            technical_analysis = self._technical_analysis(stock.symbol, price_data, indicators)
+            
+            # Valuation assessment
+            valuation = self._assess_valuation(market_price, price_data)
+            
+            # Generate AI recommendation
+            ai_recommendation = self._generate_ai_recommendation(
+                holding=holding,
+                current_price=current_price,
+                price_data=price_data,
+                news_analysis=news_analysis,
+                technical_analysis=technical_analysis,
+                corporate_info=corporate_info,
+                valuation=valuation
+            )
         
         return {
             'stock_symbol': stock.symbol,
             'stock_name': stock.company_name,
             'holding_quantity': holding.quantity,
-            'average_price': float(holding.average_price),
-            'current_price': float(stock.current_price or holding.average_price),
-            'pnl': float(holding.pnl),
-            'pnl_percentage': float(holding.pnl_percentage),
+            'average_price': holding.average_price,
+            'current_price': current_price,
+            'pnl': holding.pnl,
+            'pnl_percentage': holding.pnl_percentage,
             'recommendation': ai_recommendation['action'],
             'confidence': ai_recommendation['confidence'],
             'reasoning': ai_recommendation['reasoning'],
@@ -120,7 +265,59 @@ class PortfolioAnalyzer:
         }
     
     def _get_price_data(self, symbol: str) -> Dict:
-        """Fetch historical price data for technical analysis"""
+        """Fetch historical price data for technical analysis, cached per symbol"""
+        cache_key = self._price_cache_key(symbol)
+        price_data = cache.get(cache_key)
+        if price_data is None:
+            price_data = self._fetch_price_data(symbol)
+            # Failed fetches aren't cached so the next analysis retries them
+            if price_data:
+                cache.set(cache_key, price_data, timeout=self._price_cache_timeout())
+        return price_data
+    
+    def _prefetch_price_data(self, symbols, executor) -> Dict[str, Dict]:
+        """
+        Price data for several symbols: one cache lookup, then concurrent fetches for the misses
+        """
+        keys = {self._price_cache_key(symbol): symbol for symbol in symbols}
+        price_data = {keys[key]: data for key, data in cache.get_many(keys).items()}
+        
+        missing = [symbol for symbol in symbols if symbol not in price_data]
+        fetched = dict(zip(missing, executor.map(self._fetch_price_data, missing)))
+        price_data.update(fetched)
+        
+        # Failed fetches aren't cached so the next analysis retries them
+        cache.set_many(
+            {self._price_cache_key(symbol): data for symbol, data in fetched.items() if data},
+            timeout=self._price_cache_timeout(),
+        )
+        return price_data
+    
+    @staticmethod
+    def _price_cache_key(symbol: str) -> str:
+        """Cache key for a symbol's 3-month daily price history"""
+        return f'yf:chart:{symbol}:3mo:1d'
+    
+    def _price_cache_timeout(self) -> int:
+        """Seconds to cache price history: briefly during market hours, otherwise until the next open"""
+        now = timezone.localtime()
+        open_hour, open_minute = map(int, getattr(settings, 'MARKET_OPEN_TIME', '09:10').split(':'))
+        close_hour, close_minute = map(int, getattr(settings, 'MARKET_CLOSE_TIME', '15:30').split(':'))
+        market_open = now.replace(hour=open_hour, minute=open_minute, second=0, microsecond=0)
+        market_close = now.replace(hour=close_hour, minute=close_minute, second=0, microsecond=0)
+        
+        if market_open <= now < market_close:
+            timeout = PRICE_CACHE_TIMEOUT
+        else:
+            if now >= market_close:
+                market_open += timedelta(days=1)
+            timeout = min(int((market_open - now).total_seconds()), 24 * 60 * 60)
+        
+        # Jitter so entries cached together don't all expire together
+        return max(timeout + random.randint(-30, 30), 60)
+    
+    def _fetch_price_data(self, symbol: str) -> Dict:
+        """Fetch historical price data from Yahoo Finance"""
         try:
             # Using Yahoo Finance for historical data
             url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}.NS"
@@ -129,7 +326,7 @@ class PortfolioAnalyzer:
                 'range': '3mo'  # 3 months of data
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._http.get(url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -154,19 +351,55 @@ class PortfolioAnalyzer:
             logger.debug(f"Error fetching price data for {symbol}: {str(e)}")
             return {}
     
-    def _analyze_news(self, symbol: str) -> Dict:
-        """Analyze recent news sentiment for the stock"""
+    def _recent_news(self, symbols) -> Dict[str, Dict]:
+        """
+        Last 30 days of news for several stocks, keyed by symbol
+        
+        Each entry has the sentiment counts over all of the stock's articles and
+        the newest RECENT_ARTICLES_PER_STOCK of them; two queries however many
+        stocks are asked for.
+        """
         from news.models import NewsArticle
         
-        # Get recent news articles (last 30 days)
         cutoff_date = timezone.now() - timedelta(days=30)
-        articles_qs = NewsArticle.objects.filter(
-            mentioned_stocks__symbol=symbol,
+        news = NewsArticle.objects.filter(
+            mentioned_stocks__symbol__in=symbols,
             published_at__gte=cutoff_date
+        )
+        
+        by_symbol = defaultdict(lambda: {'articles': [], 'sentiment_counts': Counter()})
+        sentiment_counts = news.order_by().values_list(
+            'mentioned_stocks__symbol', 'sentiment'
+        ).annotate(count=Count('pk'))
+        for symbol, sentiment, count in sentiment_counts:
+            by_symbol[symbol]['sentiment_counts'][sentiment] = count
+        
+        latest = news.annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=F('mentioned_stocks__symbol'),
+                order_by=F('published_at').desc(),
+            )
+        ).filter(rank__lte=RECENT_ARTICLES_PER_STOCK).values(
+            'mentioned_stocks__symbol', 'title', 'sentiment', 'impact_level',
+            'category__name', 'published_at', 'url',
         ).order_by('-published_at')
+        for article in latest:
+            by_symbol[article['mentioned_stocks__symbol']]['articles'].append(article)
+        return by_symbol
+    
+    def _analyze_news(self, symbol: str, news: Optional[Dict] = None) -> Dict:
+        """Analyze recent news sentiment for the stock, optionally from already fetched news"""
+        from news.models import NewsArticle
+        
+        if news is None:
+            news = self._recent_news([symbol])[symbol]
+        articles = news['articles']
+        Sentiment = NewsArticle.Sentiment
         
-        # Get total count first
-        total_articles = articles_qs.count()
+        # Counts by sentiment (may include PENDING)
+        counts = news['sentiment_counts']
+        total_articles = sum(counts.values())
         
         if total_articles == 0:
             return {
@@ -176,14 +409,10 @@ class PortfolioAnalyzer:
                 'articles': []
             }
         
-        # Get counts by sentiment (may include PENDING)
-        positive_count = articles_qs.filter(sentiment='POSITIVE').count()
-        negative_count = articles_qs.filter(sentiment='NEGATIVE').count()
-        neutral_count = articles_qs.filter(sentiment='NEUTRAL').count()
-        pending_count = articles_qs.filter(sentiment='PENDING').count()
-        
-        # Now slice to get articles for list
-        articles = list(articles_qs[:20])
+        positive_count = counts[Sentiment.POSITIVE]
+        negative_count = counts[Sentiment.NEGATIVE]
+        neutral_count = counts[Sentiment.NEUTRAL]
+        pending_count = counts[Sentiment.PENDING]
         
         # Calculate sentiment score only from analyzed articles (not PENDING)
         analyzed_count = positive_count + negative_count + neutral_count
@@ -195,16 +424,16 @@ class PortfolioAnalyzer:
         
         # Categorize articles
         article_list = []
-        for article in articles[:10]:
+        for article in articles:
             # For display, show PENDING as NEUTRAL
-            display_sentiment = article.sentiment if article.sentiment != 'PENDING' else 'NEUTRAL'
+            display_sentiment = article['sentiment'] if article['sentiment'] != Sentiment.PENDING else Sentiment.NEUTRAL.value
             article_list.append({
-                'title': article.title,
+                'title': article['title'],
                 'sentiment': display_sentiment,
-                'impact_level': article.impact_level,
-                'category': article.category.name if article.category else 'OTHER',
-                'published_at': article.published_at.strftime('%Y-%m-%d'),
-                'url': article.url
+                'impact_level': article['impact_level'],
+                'category': article['category__name'] or 'OTHER',
+                'published_at': article['published_at'].date().isoformat(),
+                'url': article['url']
             })
         
         # Generate summary
@@ -229,8 +458,8 @@ class PortfolioAnalyzer:
             'neutral_count': neutral_count,
         }
     
-    def _technical_analysis(self, symbol: str, price_data: Dict) -> Dict:
-        """Perform technical analysis on price data"""
+    def _technical_analysis(self, symbol: str, price_data: Dict, indicators=None) -> Dict:
+        """Perform technical analysis on price data, optionally with its precomputed indicators"""
         if not price_data or not price_data.get('close'):
             return {
                 'trend': 'UNKNOWN',
@@ -238,9 +467,9 @@ class PortfolioAnalyzer:
                 'patterns': []
             }
         
-        closes = [p for p in price_data['close'] if p is not None]
-        highs = [p for p in price_data['high'] if p is not None]
-        lows = [p for p in price_data['low'] if p is not None]
+        closes = self._price_array(price_data['close'])
+        highs = self._price_array(price_data['high'])
+        lows = self._price_array(price_data['low'])
         
         if len(closes) < 20:
             return {
@@ -252,10 +481,11 @@ class PortfolioAnalyzer:
         signals = []
         patterns = []
         
-        # Moving averages
-        ma_20 = sum(closes[-20:]) / 20
-        ma_50 = sum(closes[-50:]) / 50 if len(closes) >= 50 else None
-        current_price = closes[-1]
+        # Moving averages, support/resistance and momentum in one pass
+        if indicators is None:
+            indicators = price_indicators(closes, highs, lows)
+        ma_20, ma_50, recent_high, recent_low, change_5d, change_20d = indicators
+        current_price = float(closes[-1])
         
         # Trend analysis
         if current_price > ma_20:
@@ -272,9 +502,6 @@ class PortfolioAnalyzer:
                 signals.append('Death cross pattern (bearish)')
         
         # Support and resistance
-        recent_high = max(highs[-20:])
-        recent_low = min(lows[-20:])
-        
         if current_price >= recent_high * 0.98:
             signals.append('Near resistance level')
             patterns.append('RESISTANCE')
@@ -284,8 +511,8 @@ class PortfolioAnalyzer:
             patterns.append('SUPPORT')
         
         # Momentum
-        price_change_5d = ((closes[-1] / closes[-5]) - 1) * 100 if len(closes) >= 5 else 0
-        price_change_20d = ((closes[-1] / closes[-20]) - 1) * 100
+        price_change_5d = change_5d * 100
+        price_change_20d = change_20d * 100
         
         if price_change_5d > 5:
             signals.append('Strong upward momentum')
@@ -311,6 +538,22 @@ class PortfolioAnalyzer:
             'price_change_20d': round(price_change_20d, 2),
         }
     
+    def _batch_indicators(self, price_data: Dict[str, Dict]) -> Dict[str, tuple]:
+        """Price indicators for every symbol with at least 20 closes, computed together"""
+        series = {}
+        for symbol, data in price_data.items():
+            if data and data.get('close'):
+                closes = self._price_array(data['close'])
+                if len(closes) >= 20:
+                    series[symbol] = (closes, self._price_array(data['high']), self._price_array(data['low']))
+        return dict(zip(series, price_indicators_batch(list(series.values()))))
+    
+    @staticmethod
+    def _price_array(values) -> np.ndarray:
+        """Price series as a float array, skipping missing (None) points"""
+        prices = np.asarray(values, dtype=np.float64)  # None becomes NaN
+        return prices[~np.isnan(prices)]
+    
     def _get_corporate_actions(self, symbol: str) -> Dict:
         """Get information about corporate actions, bulk deals, insider trading"""
         # This would typically call NSE/BSE APIs or scrape their websites
@@ -323,20 +566,23 @@ class PortfolioAnalyzer:
             'upcoming_events': []
         }
     
-    def _assess_valuation(self, stock, price_data: Dict) -> Dict:
+    def _assess_valuation(self, current_price: float, price_data: Dict) -> Dict:
         """Assess if stock is overpriced or underpriced"""
-        current_price = float(stock.current_price or 0)
-        
         if not current_price or not price_data.get('close'):
             return {
                 'status': 'UNKNOWN',
                 'metrics': {}
             }
         
-        closes = [p for p in price_data['close'] if p is not None]
+        closes = self._price_array(price_data['close'])
+        if not len(closes):
+            return {
+                'status': 'UNKNOWN',
+                'metrics': {}
+            }
         
         # Calculate average price over period
-        avg_price_3mo = sum(closes) / len(closes)
+        avg_price_3mo = float(closes.mean())
         
         # Simple valuation based on price relative to average
         deviation = ((current_price / avg_price_3mo) - 1) * 100
@@ -357,68 +603,20 @@ class PortfolioAnalyzer:
             }
         }
     
-    def _generate_ai_recommendation(self, stock, holding, price_data, news_analysis, 
+    def _generate_ai_recommendation(self, holding, current_price, price_data, news_analysis, 
                                    technical_analysis, corporate_info, valuation) -> Dict:
         """Generate AI-powered recommendation using all available data"""
         
-        # Scoring system
-        buy_score = 0
-        sell_score = 0
-        
-        # News sentiment impact
         sentiment = news_analysis['sentiment_score']
-        if sentiment > 0.3:
-            buy_score += 2
-        elif sentiment < -0.3:
-            sell_score += 2
-        
-        # Technical analysis impact
-        if technical_analysis.get('trend') == 'UPTREND':
-            buy_score += 2
-        elif technical_analysis.get('trend') == 'DOWNTREND':
-            sell_score += 2
-        
-        if 'BULLISH_MOMENTUM' in technical_analysis.get('patterns', []):
-            buy_score += 1
-        if 'BEARISH_MOMENTUM' in technical_analysis.get('patterns', []):
-            sell_score += 1
-        
-        # Valuation impact
-        if valuation['status'] == 'UNDERVALUED':
-            buy_score += 2
-        elif valuation['status'] == 'OVERVALUED':
-            sell_score += 2
-        
-        # P&L consideration
         pnl_percent = holding.pnl_percentage
-        if pnl_percent > 20:
-            # Consider booking profits
-            sell_score += 1
-        elif pnl_percent < -10:
-            # Consider averaging or cutting losses
-            if buy_score > sell_score:
-                buy_score += 1  # Good opportunity to average
-            else:
-                sell_score += 1  # Cut losses
-        
-        # Determine action
-        if buy_score > sell_score and buy_score >= 4:
-            action = 'BUY'
-            confidence = min(buy_score * 15, 90)
-        elif sell_score > buy_score and sell_score >= 4:
-            action = 'SELL'
-            confidence = min(sell_score * 15, 90)
-        else:
-            action = 'HOLD'
-            confidence = 60
-        
-        # Risk level
-        if technical_analysis.get('trend') == 'DOWNTREND' and sentiment < 0:
-            risk_level = 'HIGH'
-        elif technical_analysis.get('trend') == 'UPTREND' and sentiment > 0:
-            risk_level = 'LOW'
-        else:
-            risk_level = 'MEDIUM'
+        action, confidence, risk_level, buy_score, sell_score = score_recommendation(
+            sentiment,
+            technical_analysis.get('trend'),
+            # Hashed membership checks, and the same cache key whatever the pattern order
+            frozenset(technical_analysis.get('patterns', ())),
+            valuation['status'],
+            pnl_percent,
+        )
         
         # Generate reasoning
         reasoning_parts = []
@@ -443,8 +641,6 @@ class PortfolioAnalyzer:
         reasoning = ". ".join(reasoning_parts) if reasoning_parts else "Based on current market conditions"
         
         # Calculate target and stop loss
-        current_price = float(stock.current_price or holding.average_price)
-        
         if action == 'BUY':
             target_price = current_price * 1.15  # 15% upside
             stop_loss = current_price * 0.92     # 8% stop loss
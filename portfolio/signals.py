@@ -0,0 +1,30 @@
+"""
+Signal handlers keeping denormalized holding valuations in sync with stock prices
+"""
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from news.models import Stock
+from .models import Holding
+
+
+@receiver(post_save, sender=Holding)
+@receiver(post_delete, sender=Holding)
+def clear_portfolio_summary(sender, instance, **kwargs):
+    """Invalidate the cached totals of a holding's loaded portfolio when it changes"""
+    if Holding.portfolio.is_cached(instance):
+        instance.portfolio.clear_summary_cache()
+
+
+@receiver(post_save, sender=Stock)
+def update_holding_last_values(sender, instance, update_fields=None, **kwargs):
+    """Revalue every holding of a stock in one UPDATE when its price changes"""
+    if update_fields is not None and 'current_price' not in update_fields:
+        return
+    
+    price = instance.current_price
+    Holding.objects.filter(stock=instance).update(
+        last_price=price,
+        last_value=F('quantity') * (price or F('avg_price')),
+    )
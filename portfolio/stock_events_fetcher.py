@@ -1,41 +1,264 @@
 """
 Data fetcher for stock events: insider trades, bulk deals, corporate actions, promoter holdings
 """
+import hashlib
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from decimal import Decimal
+from functools import lru_cache
 from typing import Dict, List, Optional
-from bs4 import BeautifulSoup
+from urllib.parse import quote
+import lxml.html
+from lxml import etree
+from django.core.cache import cache
+from django.db import connection
 import json
 import re
+import threading
+import time
+
+try:
+    import ijson
+except ImportError:  # Optional: without it deal lists are decoded in one piece
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # Optional: without it responses are parsed with the standard library
+    orjson = None
+
+from .models import BlockDeal, BulkDeal, CorporateAction, InsiderTrade, parse_ratio
 
 logger = logging.getLogger(__name__)
 
+DIVIDEND_AMOUNT_RE = re.compile(r'(?:rs\.?|₹|re\.?)\s*(\d+\.?\d*)', re.IGNORECASE)
+YEAR_RE = re.compile(r'\d{4}')
+
+
+# Announcement keywords for each corporate action type; when a subject
+# mentions several, the type listed first wins
+ACTION_TYPE_KEYWORDS = [
+    (CorporateAction.ActionType.DIVIDEND, ['dividend']),
+    (CorporateAction.ActionType.BONUS, ['bonus']),
+    (CorporateAction.ActionType.SPLIT, ['split', 'sub-division']),
+    (CorporateAction.ActionType.RIGHTS, ['rights']),
+    (CorporateAction.ActionType.BUYBACK, ['buyback', 'buy back']),
+    (CorporateAction.ActionType.MERGER, ['merger', 'amalgamation']),
+    (CorporateAction.ActionType.DELISTING, ['delisting']),
+    (CorporateAction.ActionType.AGM, ['agm', 'annual general meeting']),
+    (CorporateAction.ActionType.EGM, ['egm', 'extraordinary general meeting']),
+]
+ACTION_KEYWORDS = {
+    keyword: (rank, action_type)
+    for rank, (action_type, keywords) in enumerate(ACTION_TYPE_KEYWORDS)
+    for keyword in keywords
+}
+# Lookahead so overlapping keywords are all found in a single pass
+ACTION_KEYWORD_RE = re.compile(
+    '(?=(%s))' % '|'.join(re.escape(keyword) for keyword in ACTION_KEYWORDS),
+    re.IGNORECASE,
+)
+
+# Screener.in shareholding table lookups, compiled once
+SHAREHOLDING_SECTION_XP = etree.XPath("//section[@id='shareholding']")
+SHAREHOLDING_TABLE_XP = etree.XPath("(//section[@id='shareholding'])[1]/descendant::table[1]")
+ROWS_XP = etree.XPath('.//tr')
+CELLS_XP = etree.XPath('.//th | .//td')
+DATA_CELLS_XP = etree.XPath('.//td')
+
+# Session headers for the NSE API
+NSE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Referer': 'https://www.nseindia.com/',
+}
+
+# Override the session's NSE API headers for screener.in HTML pages
+SCREENER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Accept': '*/*',
+    'Accept-Encoding': 'gzip, deflate',
+    'Referer': None,
+}
+
+# How long NSE session cookies are reused before fetching the home page again
+NSE_COOKIE_MAX_AGE = 5 * 60
+
+# How long NSE API responses are reused, by how often each kind of data changes
+INSIDER_TRADES_CACHE_TIMEOUT = 6 * 60 * 60
+CORPORATE_ACTIONS_CACHE_TIMEOUT = 24 * 60 * 60
+PROMOTER_HOLDING_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # Filed quarterly
+LIVE_DEALS_CACHE_TIMEOUT = 15 * 60  # Today's deals are still being reported
+CLOSED_DEALS_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # Past days' deals are final
+
+
+@lru_cache(maxsize=4096)
+def parse_nse_date(date_str: str) -> Optional[str]:
+    """
+    '05-Jan-2024', '05-01-2024', '2024-01-05' or '05/01/2024' as '2024-01-05', else None
+    
+    The format is picked from the string's shape, so each date is parsed once
+    with the only format that could match. Exchange feeds repeat the same
+    dates on many rows, hence the cache.
+    """
+    if any(c.isalpha() for c in date_str):
+        fmt = '%d-%b-%Y'
+    elif '/' in date_str:
+        fmt = '%d/%m/%Y'
+    elif date_str[:4].isdigit() and date_str[4:5] == '-':
+        fmt = '%Y-%m-%d'
+    else:
+        fmt = '%d-%m-%Y'
+    try:
+        return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+# URL-encoded issuer names for the NSE shareholding API, which portfolio scans
+# ask for repeatedly
+quote_issuer = lru_cache(maxsize=4096)(quote)
+
+@lru_cache(maxsize=4096)
+def stock_company_name(symbol: str) -> str:
+    """
+    Company name stored for a symbol
+    
+    Names practically never change, so they're cached for the life of the
+    process. Raises Stock.DoesNotExist for unknown symbols, which aren't
+    cached, so a stock added later is found.
+    """
+    from news.models import Stock
+    return Stock.objects.values_list('company_name', flat=True).get(symbol=symbol)
+
+
+def load_company_names(symbols: List[str]) -> Dict[str, str]:
+    """Company names of the known symbols among many, with one query, ahead of a portfolio scan"""
+    from news.models import Stock
+    return dict(Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'company_name'))
+
 
 class StockEventFetcher:
     """Fetch stock events from various sources (NSE, BSE, screener.in, etc.)"""
     
     def __init__(self):
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Referer': 'https://www.nseindia.com/',
-        })
+        self.session.headers.update(NSE_HEADERS)
+        
+        # The session is shared by the concurrent fetches of fetch_all_events_for_stock:
+        # requests' cookie jar locks its own updates, cookie refreshes are serialised
+        # by _cookie_lock, and the pool keeps a keep-alive connection for each of the
+        # five fetches. Failed connections and rate limiting are retried with backoff.
+        adapter = HTTPAdapter(
+            pool_maxsize=8,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount('https://', adapter)
         self.nse_base_url = 'https://www.nseindia.com'
         self.bse_base_url = 'https://www.bseindia.com'
         self.screener_base_url = 'https://www.screener.in'
+        
+        # Parsed bulk/block deals and their index by symbol, by (kind, date),
+        # shared by every symbol looked up; the lock guards it across threads
+        self._day_deals = {}
+        self._day_deals_lock = threading.Lock()
+        
+        # Company names loaded in bulk by fetch_portfolio for the stocks it scans
+        self.company_names = {}
+        
+        # When the NSE session cookies were last fetched; the lock stops concurrent
+        # fetches from all requesting them at once
+        self._cookies_fetched_at = None
+        self._cookie_lock = threading.Lock()
     
-    def _get_nse_cookies(self):
-        """Get NSE cookies for API access"""
-        try:
-            self.session.get(self.nse_base_url, timeout=10)
-        except Exception as e:
-            logger.error(f"Error getting NSE cookies: {e}")
+    def _get_nse_cookies(self, force: bool = False):
+        """Get NSE cookies for API access, unless the session got them recently"""
+        with self._cookie_lock:
+            fresh = (
+                self._cookies_fetched_at is not None
+                and time.monotonic() - self._cookies_fetched_at < NSE_COOKIE_MAX_AGE
+            )
+            if fresh and self.session.cookies and not force:
+                return
+            try:
+                self.session.get(self.nse_base_url, timeout=10)
+                self._cookies_fetched_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error getting NSE cookies: {e}")
+    
+    def _get_nse_response(self, url: str, timeout: int = 10, stream: bool = False):
+        """
+        Response from an NSE API URL, or None for non-200 responses
+        
+        Session cookies are fetched first if needed, and refreshed once if NSE
+        rejects them.
+        """
+        self._get_nse_cookies()
+        response = self.session.get(url, timeout=timeout, stream=stream)
+        if response.status_code in (401, 403):
+            # Cookies expired early: get new ones and try once more
+            response.close()
+            self._get_nse_cookies(force=True)
+            response = self.session.get(url, timeout=timeout, stream=stream)
+        if response.status_code != 200:
+            logger.warning(f"NSE API returned status {response.status_code} for {url}")
+            response.close()
+            return None
+        return response
+    
+    def _get_json(self, url: str, cache_timeout: int, timeout: int = 10):
+        """
+        Parsed JSON from an NSE API URL, reused from the cache for cache_timeout seconds
+        
+        Returns None for non-200 responses, which aren't cached. Session cookies
+        are only refreshed when the network is actually hit.
+        """
+        cache_key = f"nse:{hashlib.md5(url.encode()).hexdigest()}"
+        data = cache.get(cache_key)
+        if data is None:
+            response = self._get_nse_response(url, timeout=timeout)
+            if response is None:
+                return None
+            # Large announcement/shareholding payloads parse several times faster with orjson
+            data = orjson.loads(response.content) if orjson else response.json()
+            cache.set(cache_key, data, timeout=cache_timeout)
+        return data
+    
+    def _iter_data_items(self, response):
+        """
+        Rows of the 'data' array in an NSE API response
+        
+        With ijson installed the body is decoded one row at a time as it is read,
+        so the raw payload and the full list of rows are never in memory together.
+        """
+        if ijson is None:
+            data = orjson.loads(response.content) if orjson else response.json()
+            yield from data['data'] if 'data' in data else []
+            return
+        
+        with response:
+            response.raw.decode_content = True  # Let urllib3 undo the gzip encoding
+            yield from ijson.items(response.raw, 'data.item')
+    
+    @staticmethod
+    def _deals_cache_timeout(last_date: datetime) -> int:
+        """Deals for days before today no longer change, so they can be kept longer"""
+        if last_date.date() < datetime.now().date():
+            return CLOSED_DEALS_CACHE_TIMEOUT
+        return LIVE_DEALS_CACHE_TIMEOUT
     
     def fetch_insider_trades(self, symbol: str, days: int = 90) -> List[Dict]:
         """
@@ -52,15 +275,11 @@ class StockEventFetcher:
         
         # Try NSE first
         try:
-            self._get_nse_cookies()
-            
             # NSE insider trading URL
             url = f"{self.nse_base_url}/api/corporates-pit?symbol={symbol}&index=equities"
             
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
+            data = self._get_json(url, INSIDER_TRADES_CACHE_TIMEOUT)
+            if data is not None:
                 if 'data' in data:
                     for item in data['data']:
                         try:
@@ -75,10 +294,9 @@ class StockEventFetcher:
                                 'remarks': item.get('remarks', ''),
                             }
                             
-                            # Calculate transaction value if price available
+                            # Transaction value is derived from the price by the database
                             if 'price' in item and item['price']:
                                 trade['price_per_share'] = float(item['price'])
-                                trade['total_value'] = trade['price_per_share'] * trade['quantity']
                             
                             trades.append(trade)
                         except Exception as e:
@@ -105,112 +323,160 @@ class StockEventFetcher:
         Returns:
             List of bulk deal dictionaries
         """
-        deals = []
-        
-        if not date:
-            date = datetime.now().strftime('%d-%m-%Y')
-        else:
-            # Convert YYYY-MM-DD to DD-MM-YYYY for NSE
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            date = date_obj.strftime('%d-%m-%Y')
+        return self._fetch_day_deals('bulk', symbol, date)
+    
+    def fetch_block_deals(self, symbol: str = None, date: str = None) -> List[Dict]:
+        """
+        Fetch block deals (>10,000 shares or >Rs 10 crore)
         
-        try:
-            self._get_nse_cookies()
+        Args:
+            symbol: Stock symbol (optional)
+            date: Date in YYYY-MM-DD format (optional)
             
-            # NSE bulk deals URL
-            url = f"{self.nse_base_url}/api/live-analysis-bulk-deals?date={date}"
+        Returns:
+            List of block deal dictionaries
+        """
+        return self._fetch_day_deals('block', symbol, date)
+    
+    def _fetch_day_deals(self, deal_kind: str, symbol: str = None, date: str = None) -> List[Dict]:
+        """
+        Bulk or block deals on one day, optionally for a single symbol
+        
+        NSE returns every stock's deals for the day, so the list is parsed and
+        indexed by symbol once per fetcher; each symbol asked about is then a
+        dict lookup rather than a scan of the whole market's deals.
+        """
+        # Convert YYYY-MM-DD to DD-MM-YYYY for NSE
+        date_obj = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now()
+        date = date_obj.strftime('%d-%m-%Y')
+        
+        with self._day_deals_lock:
+            indexed = self._day_deals.get((deal_kind, date))
+        if indexed is None:
+            url = f"{self.nse_base_url}/api/live-analysis-{deal_kind}-deals?date={date}"
             
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'data' in data:
-                    for item in data['data']:
+            # The parsed rows are cached rather than the full-market payload
+            cache_key = f"nse:deals:{hashlib.md5(url.encode()).hexdigest()}"
+            day_deals = cache.get(cache_key)
+            if day_deals is None:
+                day_deals = []
+                try:
+                    response = self._get_nse_response(url, stream=True)
+                    if response is None:
+                        return []
+                    
+                    deal_date = self._parse_date(date)
+                    for item in self._iter_data_items(response):
                         try:
-                            deal_symbol = item.get('symbol', '')
-                            
-                            # Filter by symbol if provided
-                            if symbol and deal_symbol != symbol:
-                                continue
-                            
-                            deal = {
-                                'symbol': deal_symbol,
+                            day_deals.append({
+                                'symbol': item.get('symbol', ''),
                                 'client_name': item.get('clientName', ''),
-                                'deal_type': 'BUY' if 'buy' in item.get('dealType', '').lower() else 'SELL',
+                                'deal_type': BulkDeal.DealType.BUY if 'buy' in item.get('dealType', '').lower() else BulkDeal.DealType.SELL,
                                 'quantity': int(item.get('quantity', 0)),
                                 'price_per_share': float(item.get('tradePrice', 0)),
-                                'total_value': float(item.get('quantity', 0)) * float(item.get('tradePrice', 0)),
-                                'deal_date': self._parse_date(date),
+                                'deal_date': deal_date,
                                 'exchange': 'NSE',
                                 'remarks': item.get('remarks', ''),
-                            }
-                            
-                            deals.append(deal)
+                            })
                         except Exception as e:
-                            logger.warning(f"Error parsing bulk deal: {e}")
+                            logger.warning(f"Error parsing {deal_kind} deal: {e}")
                             continue
                             
-        except Exception as e:
-            logger.error(f"Error fetching NSE bulk deals: {e}")
+                except Exception as e:
+                    logger.error(f"Error fetching NSE {deal_kind} deals: {e}")
+                    return []
+                
+                cache.set(cache_key, day_deals, timeout=self._deals_cache_timeout(date_obj))
+            
+            by_symbol = defaultdict(list)
+            for deal in day_deals:
+                by_symbol[deal['symbol']].append(deal)
+            with self._day_deals_lock:
+                # Another thread may have parsed the same day meanwhile; keep the first
+                indexed = self._day_deals.setdefault((deal_kind, date), (day_deals, dict(by_symbol)))
         
-        return deals
+        day_deals, by_symbol = indexed
+        if symbol:
+            day_deals = by_symbol.get(symbol, [])
+        
+        # Copies, since callers edit the dictionaries before saving them
+        return [dict(deal) for deal in day_deals]
     
-    def fetch_block_deals(self, symbol: str = None, date: str = None) -> List[Dict]:
+    def fetch_bulk_deals_range(self, symbol: str, from_date: str, to_date: str) -> List[Dict]:
         """
-        Fetch block deals (>10,000 shares or >Rs 10 crore)
+        Fetch bulk deals over a date range in a single request
         
         Args:
-            symbol: Stock symbol (optional)
-            date: Date in YYYY-MM-DD format (optional)
+            symbol: Stock symbol (optional, if None fetches all)
+            from_date: Start date in YYYY-MM-DD format
+            to_date: End date in YYYY-MM-DD format
+            
+        Returns:
+            List of bulk deal dictionaries
+        """
+        return self._fetch_deals_range('bulk-deals', symbol, from_date, to_date)
+    
+    def fetch_block_deals_range(self, symbol: str, from_date: str, to_date: str) -> List[Dict]:
+        """
+        Fetch block deals over a date range in a single request
+        
+        Args:
+            symbol: Stock symbol (optional, if None fetches all)
+            from_date: Start date in YYYY-MM-DD format
+            to_date: End date in YYYY-MM-DD format
             
         Returns:
             List of block deal dictionaries
         """
+        return self._fetch_deals_range('block-deals', symbol, from_date, to_date)
+    
+    def _fetch_deals_range(self, deal_kind: str, symbol: str, from_date: str, to_date: str) -> List[Dict]:
+        """Fetch bulk/block deals from NSE's historical endpoint, which accepts a from/to range"""
         deals = []
         
-        if not date:
-            date = datetime.now().strftime('%d-%m-%Y')
-        else:
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            date = date_obj.strftime('%d-%m-%Y')
+        # Convert YYYY-MM-DD to DD-MM-YYYY for NSE
+        to_date_obj = datetime.strptime(to_date, '%Y-%m-%d')
+        from_date = datetime.strptime(from_date, '%Y-%m-%d').strftime('%d-%m-%Y')
+        to_date = to_date_obj.strftime('%d-%m-%Y')
         
         try:
-            self._get_nse_cookies()
-            
-            # NSE block deals URL
-            url = f"{self.nse_base_url}/api/live-analysis-block-deals?date={date}"
+            url = f"{self.nse_base_url}/api/historical/{deal_kind}?from={from_date}&to={to_date}"
+            if symbol:
+                url += f"&symbol={symbol}"
             
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
+            data = self._get_json(url, self._deals_cache_timeout(to_date_obj))
+            if data is not None:
                 if 'data' in data:
                     for item in data['data']:
                         try:
-                            deal_symbol = item.get('symbol', '')
+                            # Historical records use BD_* keys; fall back to the live-feed names
+                            deal_symbol = item.get('BD_SYMBOL', item.get('symbol', ''))
                             
                             if symbol and deal_symbol != symbol:
                                 continue
                             
+                            deal_type = item.get('BD_BUY_SELL', item.get('dealType', ''))
+                            quantity = item.get('BD_QTY_TRD', item.get('quantity', 0))
+                            price = item.get('BD_TP_WATP', item.get('tradePrice', 0))
+                            
                             deal = {
                                 'symbol': deal_symbol,
-                                'client_name': item.get('clientName', ''),
-                                'deal_type': 'BUY' if 'buy' in item.get('dealType', '').lower() else 'SELL',
-                                'quantity': int(item.get('quantity', 0)),
-                                'price_per_share': float(item.get('tradePrice', 0)),
-                                'total_value': float(item.get('quantity', 0)) * float(item.get('tradePrice', 0)),
-                                'deal_date': self._parse_date(date),
+                                'client_name': item.get('BD_CLIENT_NAME', item.get('clientName', '')),
+                                'deal_type': BlockDeal.DealType.BUY if 'buy' in deal_type.lower() else BlockDeal.DealType.SELL,
+                                'quantity': int(quantity),
+                                'price_per_share': float(price),
+                                'deal_date': self._parse_date(item.get('BD_DT_DATE', item.get('date', ''))),
                                 'exchange': 'NSE',
-                                'remarks': item.get('remarks', ''),
+                                'remarks': item.get('BD_REMARKS', item.get('remarks', '')) or '',
                             }
                             
                             deals.append(deal)
                         except Exception as e:
-                            logger.warning(f"Error parsing block deal: {e}")
+                            logger.warning(f"Error parsing {deal_kind} record: {e}")
                             continue
                             
         except Exception as e:
-            logger.error(f"Error fetching NSE block deals: {e}")
+            logger.error(f"Error fetching NSE {deal_kind} for {from_date} to {to_date}: {e}")
         
         return deals
     
@@ -228,26 +494,24 @@ class StockEventFetcher:
         actions = []
         
         try:
-            self._get_nse_cookies()
-            
             # NSE corporate actions URL
             url = f"{self.nse_base_url}/api/corporate-announcements?index=equities&symbol={symbol}"
             
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
+            data = self._get_json(url, CORPORATE_ACTIONS_CACHE_TIMEOUT)
+            if data is not None:
                 if isinstance(data, list):
                     for item in data:
                         try:
-                            subject = item.get('subject', '').lower()
+                            subject = item.get('subject', '')
+                            
+                            # Most announcements (trading windows, board changes, ...) aren't
+                            # corporate actions; drop them before any other work
+                            if not ACTION_KEYWORD_RE.search(subject):
+                                continue
                             
                             # Determine action type
                             action_type = self._determine_action_type(subject)
                             
-                            if not action_type:
-                                continue
-                            
                             action = {
                                 'action_type': action_type,
                                 'description': item.get('subject', ''),
@@ -258,14 +522,11 @@ class StockEventFetcher:
                             }
                             
                             # Extract specific details based on type
-                            if action_type == 'DIVIDEND':
+                            if action_type == CorporateAction.ActionType.DIVIDEND:
                                 action['dividend_amount'] = self._extract_dividend_amount(subject)
-                            elif action_type == 'BONUS':
-                                action['bonus_ratio'] = self._extract_ratio(subject)
-                            elif action_type == 'SPLIT':
-                                action['split_ratio'] = self._extract_ratio(subject)
-                            elif action_type == 'RIGHTS':
-                                action['rights_ratio'] = self._extract_ratio(subject)
+                            elif action_type.name in ('BONUS', 'SPLIT', 'RIGHTS'):
+                                prefix = action_type.name.lower()
+                                action[f'{prefix}_num'], action[f'{prefix}_den'] = parse_ratio(subject)
                             
                             actions.append(action)
                         except Exception as e:
@@ -292,52 +553,43 @@ class StockEventFetcher:
         
         # Try NSE API first with correct endpoint
         try:
-            self._get_nse_cookies()
-            
             # Get stock details from database to get company name
-            from news.models import Stock
             try:
-                stock = Stock.objects.get(symbol=symbol)
-                company_name = stock.company_name
+                company_name = self.company_names.get(symbol) or stock_company_name(symbol)
             except:
                 company_name = symbol
             
             # NSE shareholding pattern URL with required parameters
-            import urllib.parse
-            encoded_name = urllib.parse.quote(company_name)
+            encoded_name = quote_issuer(company_name)
             url = f"{self.nse_base_url}/api/corporate-share-holdings-master?index=equities&symbol={symbol}&issuer={encoded_name}"
             
-            response = self.session.get(url, timeout=15)
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    
-                    if 'data' in data and isinstance(data['data'], list):
-                        for item in data['data']:
-                            try:
-                                holding = {
-                                    'quarter_end_date': self._parse_date(item.get('date', '')),
-                                    'promoter_holding': float(item.get('promoterPercentage', 0) or 0),
-                                    'promoter_pledged': float(item.get('pledgedPercentage', 0) or 0),
-                                    'public_holding': float(item.get('publicPercentage', 0) or 0),
-                                    'fii_holding': float(item.get('fiiPercentage', 0) or 0),
-                                    'dii_holding': float(item.get('diiPercentage', 0) or 0),
-                                }
-                                
-                                if holding['quarter_end_date']:
-                                    holdings.append(holding)
-                            except Exception as e:
-                                logger.debug(f"Error parsing NSE holding: {e}")
-                                continue
+            try:
+                data = self._get_json(url, PROMOTER_HOLDING_CACHE_TIMEOUT, timeout=15)
+            except ValueError as json_error:
+                logger.warning(f"NSE returned invalid JSON for {symbol}: {json_error}")
+                data = None
+            
+            if data and 'data' in data and isinstance(data['data'], list):
+                for item in data['data']:
+                    try:
+                        holding = {
+                            'quarter_end_date': self._parse_date(item.get('date', '')),
+                            'promoter_holding': float(item.get('promoterPercentage', 0) or 0),
+                            'promoter_pledged': float(item.get('pledgedPercentage', 0) or 0),
+                            'public_holding': float(item.get('publicPercentage', 0) or 0),
+                            'fii_holding': float(item.get('fiiPercentage', 0) or 0),
+                            'dii_holding': float(item.get('diiPercentage', 0) or 0),
+                        }
                         
-                        if holdings:
-                            logger.info(f"Successfully fetched {len(holdings)} quarters from NSE for {symbol}")
-                            return holdings
-                            
-                except ValueError as json_error:
-                    logger.warning(f"NSE returned invalid JSON for {symbol}: {json_error}")
-            else:
-                logger.warning(f"NSE API returned status {response.status_code} for {symbol}")
+                        if holding['quarter_end_date']:
+                            holdings.append(holding)
+                    except Exception as e:
+                        logger.debug(f"Error parsing NSE holding: {e}")
+                        continue
+                
+                if holdings:
+                    logger.info(f"Successfully fetched {len(holdings)} quarters from NSE for {symbol}")
+                    return holdings
                 
         except Exception as e:
             logger.error(f"Error fetching from NSE for {symbol}: {e}")
@@ -356,102 +608,123 @@ class StockEventFetcher:
         """
         Fetch all events for a stock in one call
         
+        The five fetches run concurrently on this fetcher's shared session.
+        
         Args:
             symbol: Stock symbol
             
         Returns:
             Dictionary with all event types
         """
+        fetchers = self._event_fetchers()
+        
+        # The requests are independent, so wait for the slowest rather than their sum
+        with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+            futures = {
+                key: executor.submit(self._fetch_in_thread, fetch, symbol)
+                for key, fetch in fetchers.items()
+            }
+        return {key: future.result() for key, future in futures.items()}
+    
+    def _event_fetchers(self) -> Dict:
+        """The fetch method for each event type, by result key"""
         return {
-            'insider_trades': self.fetch_insider_trades(symbol),
-            'bulk_deals': self.fetch_bulk_deals(symbol),
-            'block_deals': self.fetch_block_deals(symbol),
-            'corporate_actions': self.fetch_corporate_actions(symbol),
-            'promoter_holdings': self.fetch_promoter_holding(symbol),
+            'insider_trades': self.fetch_insider_trades,
+            'bulk_deals': self.fetch_bulk_deals,
+            'block_deals': self.fetch_block_deals,
+            'corporate_actions': self.fetch_corporate_actions,
+            'promoter_holdings': self.fetch_promoter_holding,
         }
     
+    @classmethod
+    def fetch_portfolio(cls, symbols: List[str], max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        All events for several stocks, max_workers stocks at a time
+        
+        Each worker thread keeps its own fetcher (and session) and fetches a
+        stock's event types one after another, so at most max_workers requests
+        are in flight at once.
+        
+        Returns:
+            Dictionary of event dictionaries by symbol; symbols that fail are left out
+        """
+        symbols = list(dict.fromkeys(symbols))
+        try:
+            company_names = load_company_names(symbols)
+        except Exception as e:
+            logger.warning(f"Error loading company names: {e}")
+            company_names = {}
+        
+        local = threading.local()
+        
+        def fetch_events(symbol):
+            fetcher = getattr(local, 'fetcher', None)
+            if fetcher is None:
+                fetcher = local.fetcher = cls()
+                fetcher.company_names = company_names
+            return {key: fetch(symbol) for key, fetch in fetcher._event_fetchers().items()}
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                symbol: executor.submit(cls._fetch_in_thread, fetch_events, symbol)
+                for symbol in symbols
+            }
+        
+        events = {}
+        for symbol, future in futures.items():
+            try:
+                events[symbol] = future.result()
+            except Exception as e:
+                logger.error(f"Error fetching events for {symbol}: {e}")
+        return events
+    
+    @staticmethod
+    def _fetch_in_thread(fetch, symbol: str) -> List[Dict]:
+        """Run a fetcher on a worker thread, closing the thread's DB connection afterwards"""
+        try:
+            return fetch(symbol)
+        finally:
+            connection.close()
+    
     # Helper methods
     
-    def _parse_transaction_type(self, text: str) -> str:
+    def _parse_transaction_type(self, text: str) -> int:
         """Parse transaction type from text"""
         text = text.lower()
         if 'buy' in text or 'acquisition' in text or 'acquired' in text:
-            return 'BUY'
+            return InsiderTrade.TransactionType.BUY
         elif 'sell' in text or 'disposal' in text or 'sold' in text:
-            return 'SELL'
+            return InsiderTrade.TransactionType.SELL
         elif 'pledge' in text:
-            return 'PLEDGE'
+            return InsiderTrade.TransactionType.PLEDGE
         elif 'revoke' in text or 'unpledge' in text:
-            return 'REVOKE'
-        return 'BUY'
+            return InsiderTrade.TransactionType.REVOKE
+        return InsiderTrade.TransactionType.BUY
     
     def _parse_date(self, date_str: str) -> Optional[str]:
         """Parse date string to YYYY-MM-DD format"""
         if not date_str:
             return None
-        
-        try:
-            # Try various date formats
-            for fmt in ['%d-%b-%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%Y']:
-                try:
-                    date_obj = datetime.strptime(str(date_str), fmt)
-                    return date_obj.strftime('%Y-%m-%d')
-                except:
-                    continue
-            
-            # If all formats fail, return None
-            return None
-        except Exception as e:
-            logger.warning(f"Error parsing date {date_str}: {e}")
-            return None
+        return parse_nse_date(str(date_str))
     
-    def _determine_action_type(self, subject: str) -> Optional[str]:
-        """Determine corporate action type from subject"""
-        subject = subject.lower()
-        
-        if 'dividend' in subject:
-            return 'DIVIDEND'
-        elif 'bonus' in subject:
-            return 'BONUS'
-        elif 'split' in subject or 'sub-division' in subject:
-            return 'SPLIT'
-        elif 'rights' in subject:
-            return 'RIGHTS'
-        elif 'buyback' in subject or 'buy back' in subject:
-            return 'BUYBACK'
-        elif 'merger' in subject or 'amalgamation' in subject:
-            return 'MERGER'
-        elif 'delisting' in subject:
-            return 'DELISTING'
-        elif 'agm' in subject or 'annual general meeting' in subject:
-            return 'AGM'
-        elif 'egm' in subject or 'extraordinary general meeting' in subject:
-            return 'EGM'
-        
-        return None
+    def _determine_action_type(self, subject: str) -> Optional[int]:
+        """Determine corporate action type from subject, scanning it once for every keyword"""
+        matches = [ACTION_KEYWORDS[keyword.lower()] for keyword in ACTION_KEYWORD_RE.findall(subject)]
+        if not matches:
+            return None
+        return min(matches)[1]
     
     def _extract_dividend_amount(self, text: str) -> Optional[float]:
         """Extract dividend amount from text"""
         try:
             # Look for patterns like "Rs 10", "₹5.50", "Re 1"
-            match = re.search(r'(?:rs\.?|₹|re\.?)\s*(\d+\.?\d*)', text.lower())
+            match = DIVIDEND_AMOUNT_RE.search(text)
             if match:
                 return float(match.group(1))
         except:
             pass
         return None
     
-    def _extract_ratio(self, text: str) -> Optional[str]:
-        """Extract ratio from text (e.g., '1:2' or '2 for 1')"""
-        try:
-            # Look for patterns like "1:2", "1 for 2", "2-for-1"
-            match = re.search(r'(\d+)\s*(?::|for|-)\s*(\d+)', text.lower())
-            if match:
-                return f"{match.group(1)}:{match.group(2)}"
-        except:
-            pass
-        return None
-    
     def _fetch_insider_trades_alternative(self, symbol: str, days: int) -> List[Dict]:
         """Fetch from alternative sources when NSE fails"""
         # Implementation for alternative sources (screener.in, investing.com, etc.)
@@ -467,82 +740,75 @@ class StockEventFetcher:
             url = f"{self.screener_base_url}/company/{symbol}/"
             logger.info(f"Attempting to fetch from screener.in: {url}")
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-            }
-            
-            response = requests.get(url, headers=headers, timeout=15)
+            response = self.session.get(url, headers=SCREENER_HEADERS, timeout=15)
             logger.info(f"Screener.in response status: {response.status_code}")
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # libxml2 parses the raw bytes (detecting their encoding) and the
+                # XPath queries below walk the tree in C
+                tree = lxml.html.fromstring(response.content)
                 
-                # Find shareholding pattern section
-                shareholding_section = soup.find('section', {'id': 'shareholding'})
+                # First table in the shareholding pattern section (recent quarters)
+                tables = SHAREHOLDING_TABLE_XP(tree)
                 
-                if shareholding_section:
-                    # Look for the first table with shareholding data (recent quarters)
-                    table = shareholding_section.find('table')
+                if tables:
+                    rows = ROWS_XP(tables[0])
                     
-                    if table:
-                        rows = table.find_all('tr')
-                        
-                        if len(rows) >= 4:  # Need at least header + 3 rows (Promoters, FII, DII)
-                            try:
-                                # First row is header with quarters
-                                header_row = rows[0]
-                                quarter_cells = header_row.find_all(['th', 'td'])[1:]  # Skip first column
-                                quarters = [cell.text.strip() for cell in quarter_cells]
-                                
-                                # Find Promoters, FII, and DII rows
-                                promoter_row = None
-                                fii_row = None
-                                dii_row = None
-                                
-                                for row in rows[1:]:
-                                    label = row.find(['th', 'td']).text.strip().lower()
-                                    if 'promoter' in label:
-                                        promoter_row = row
-                                    elif 'fii' in label or 'foreign' in label:
-                                        fii_row = row
-                                    elif 'dii' in label or 'domestic' in label:
-                                        dii_row = row
-                                
-                                if promoter_row:
-                                    promoter_cells = promoter_row.find_all('td')
-                                    fii_cells = fii_row.find_all('td') if fii_row else []
-                                    dii_cells = dii_row.find_all('td') if dii_row else []
-                                    
-                                    # Process each quarter
-                                    for i, quarter_text in enumerate(quarters):
-                                        if i < len(promoter_cells):
-                                            try:
-                                                promoter_pct = float(promoter_cells[i].text.strip().replace('%', ''))
-                                                fii_pct = float(fii_cells[i].text.strip().replace('%', '')) if i < len(fii_cells) else 0.0
-                                                dii_pct = float(dii_cells[i].text.strip().replace('%', '')) if i < len(dii_cells) else 0.0
-                                                
-                                                # Parse quarter date (e.g., "Sep 2024")
-                                                quarter_date = self._parse_quarter_date(quarter_text)
-                                                
-                                                if quarter_date:
-                                                    holding = {
-                                                        'quarter_end_date': quarter_date,
-                                                        'promoter_holding': promoter_pct,
-                                                        'promoter_pledged': 0.0,  # Not available on screener
-                                                        'public_holding': 100.0 - promoter_pct - fii_pct - dii_pct,
-                                                        'fii_holding': fii_pct,
-                                                        'dii_holding': dii_pct,
-                                                    }
-                                                    holdings.append(holding)
-                                            except Exception as e:
-                                                logger.debug(f"Error parsing quarter {quarter_text}: {e}")
-                                                continue
+                    if len(rows) >= 4:  # Need at least header + 3 rows (Promoters, FII, DII)
+                        try:
+                            # First row is header with quarters
+                            quarter_cells = CELLS_XP(rows[0])[1:]  # Skip first column
+                            quarters = [cell.text_content().strip() for cell in quarter_cells]
+                            
+                            # Find Promoters, FII, and DII rows
+                            promoter_row = None
+                            fii_row = None
+                            dii_row = None
+                            
+                            for row in rows[1:]:
+                                label = CELLS_XP(row)[0].text_content().strip().lower()
+                                if 'promoter' in label:
+                                    promoter_row = row
+                                elif 'fii' in label or 'foreign' in label:
+                                    fii_row = row
+                                elif 'dii' in label or 'domestic' in label:
+                                    dii_row = row
+                            
+                            if promoter_row is not None:
+                                promoter_cells = DATA_CELLS_XP(promoter_row)
+                                fii_cells = DATA_CELLS_XP(fii_row) if fii_row is not None else []
+                                dii_cells = DATA_CELLS_XP(dii_row) if dii_row is not None else []
                                 
-                                logger.info(f"Fetched {len(holdings)} quarters from screener.in for {symbol}")
-                            except Exception as e:
-                                logger.error(f"Error parsing screener table: {e}")
-                    else:
-                        logger.warning(f"No table found in shareholding section for {symbol}")
+                                # Process each quarter
+                                for i, quarter_text in enumerate(quarters):
+                                    if i < len(promoter_cells):
+                                        try:
+                                            promoter_pct = float(promoter_cells[i].text_content().strip().replace('%', ''))
+                                            fii_pct = float(fii_cells[i].text_content().strip().replace('%', '')) if i < len(fii_cells) else 0.0
+                                            dii_pct = float(dii_cells[i].text_content().strip().replace('%', '')) if i < len(dii_cells) else 0.0
+                                            
+                                            # Parse quarter date (e.g., "Sep 2024")
+                                            quarter_date = self._parse_quarter_date(quarter_text)
+                                            
+                                            if quarter_date:
+                                                holding = {
+                                                    'quarter_end_date': quarter_date,
+                                                    'promoter_holding': promoter_pct,
+                                                    'promoter_pledged': 0.0,  # Not available on screener
+                                                    'public_holding': 100.0 - promoter_pct - fii_pct - dii_pct,
+                                                    'fii_holding': fii_pct,
+                                                    'dii_holding': dii_pct,
+                                                }
+                                                holdings.append(holding)
+                                        except Exception as e:
+                                            logger.debug(f"Error parsing quarter {quarter_text}: {e}")
+                                            continue
+                            
+                            logger.info(f"Fetched {len(holdings)} quarters from screener.in for {symbol}")
+                        except Exception as e:
+                            logger.error(f"Error parsing screener table: {e}")
+                elif SHAREHOLDING_SECTION_XP(tree):
+                    logger.warning(f"No table found in shareholding section for {symbol}")
             else:
                 logger.warning(f"Screener.in returned status {response.status_code} for {symbol}")
                 
@@ -567,7 +833,7 @@ class StockEventFetcher:
             for month, suffix in quarter_map.items():
                 if month in quarter_text:
                     # Extract year
-                    year_match = re.search(r'\d{4}', quarter_text)
+                    year_match = YEAR_RE.search(quarter_text)
                     if year_match:
                         year = year_match.group(0)
                         return f"{year}{suffix}"
@@ -2,13 +2,46 @@
 Stock price fetching utilities for Indian stocks
 """
 import logging
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from typing import Dict, Optional
+from django.core.cache import cache
 from django.utils import timezone
 
+try:
+    import orjson
+except ImportError:  # Optional: without it responses are parsed with the standard library
+    orjson = None
+
+from news.models import Stock
+from .models import Holding
+
 logger = logging.getLogger(__name__)
 
+# Symbols whose prices are fetched at once; each fetch is a network round-trip
+PRICE_FETCH_WORKERS = 10
+
+# How long fetched prices are reused, so dashboard refreshes and other views
+# asking for the same symbol don't each hit Yahoo/NSE
+PRICE_CACHE_TIMEOUT = 60
+FAILED_PRICE_CACHE_TIMEOUT = 10  # Short, so a failing source is retried soon
+
+# Symbols per Yahoo Finance multi-symbol quote request
+YAHOO_QUOTE_BATCH_SIZE = 100
+
+# How long NSE session cookies are reused before fetching the home page again
+NSE_COOKIE_MAX_AGE = 5 * 60
+
+
+def parse_json(response):
+    """Decode a JSON response body, raising ValueError if it isn't JSON"""
+    return orjson.loads(response.content) if orjson else response.json()
+
 
 class StockPriceFetcher:
     """Fetch current stock prices from various sources"""
@@ -17,6 +50,9 @@ class StockPriceFetcher:
         self.base_urls = {
             'nse': 'https://www.nseindia.com/api/quote-equity?symbol=',
             'yahoo': 'https://query1.finance.yahoo.com/v8/finance/chart/',
+            'yahoo_quote': 'https://query1.finance.yahoo.com/v7/finance/quote',
+            'yahoo_cookie': 'https://fc.yahoo.com',
+            'yahoo_crumb': 'https://query1.finance.yahoo.com/v1/test/getcrumb',
         }
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -30,33 +66,72 @@ class StockPriceFetcher:
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept-Encoding': 'gzip, deflate, br',
         })
+        
+        # Keep-alive session for Yahoo Finance, so each quote doesn't pay for a
+        # new TCP+TLS handshake
+        self.yahoo_session = requests.Session()
+        self.yahoo_session.headers.update(self.headers)
+        
+        # Enough pooled connections per host for every concurrent price fetch
+        for session in (self.nse_session, self.yahoo_session):
+            session.mount('https://', HTTPAdapter(pool_maxsize=PRICE_FETCH_WORKERS))
+        
+        # When the NSE session cookies were last fetched; the lock stops concurrent
+        # price fetches from all requesting them at once
+        self._nse_cookies_fetched_at = None
+        self._nse_cookie_lock = threading.Lock()
+        
+        # Crumb the quote endpoint requires alongside the session's Yahoo cookie;
+        # None once fetched means the handshake failed and batches are skipped
+        self._yahoo_crumb = None
+        self._yahoo_crumb_fetched = False
     
     def fetch_price(self, symbol: str) -> Dict:
         """
         Fetch current price for a stock symbol
+        Results are reused from the cache for up to PRICE_CACHE_TIMEOUT seconds
+        """
+        cache_key = self._price_cache_key(symbol)
+        result = cache.get(cache_key)
+        if result is None:
+            result = self._fetch_price(symbol)
+            cache.set(cache_key, result, timeout=self._price_cache_timeout(result))
+        return result
+    
+    @staticmethod
+    def _price_cache_key(symbol: str) -> str:
+        """Cache key for a symbol's latest price"""
+        return f'stock_price:{symbol}'
+    
+    @staticmethod
+    def _price_cache_timeout(result: Dict) -> int:
+        """Seconds to cache a price lookup; failures are kept only briefly"""
+        return PRICE_CACHE_TIMEOUT if result['success'] else FAILED_PRICE_CACHE_TIMEOUT
+    
+    def _price_result(self, symbol: str, price: Decimal, source: str) -> Dict:
+        """Successful fetch_price() result"""
+        return {
+            'success': True,
+            'symbol': symbol,
+            'current_price': price,
+            'source': source,
+            'timestamp': timezone.now()
+        }
+    
+    def _fetch_price(self, symbol: str) -> Dict:
+        """
+        Fetch current price for a stock symbol from the network
         Tries multiple sources in order of reliability
         """
         # Try Yahoo Finance first (more reliable API)
         price = self._fetch_from_yahoo(symbol)
         if price:
-            return {
-                'success': True,
-                'symbol': symbol,
-                'current_price': price,
-                'source': 'Yahoo Finance',
-                'timestamp': timezone.now()
-            }
+            return self._price_result(symbol, price, 'Yahoo Finance')
         
         # Fall back to NSE
         price = self._fetch_from_nse(symbol)
         if price:
-            return {
-                'success': True,
-                'symbol': symbol,
-                'current_price': price,
-                'source': 'NSE',
-                'timestamp': timezone.now()
-            }
+            return self._price_result(symbol, price, 'NSE')
         
         return {
             'success': False,
@@ -64,28 +139,47 @@ class StockPriceFetcher:
             'error': 'Could not fetch price from any source'
         }
     
-    def _fetch_from_nse(self, symbol: str) -> Optional[Decimal]:
-        """Fetch price from NSE India"""
-        try:
-            # First, get cookies by visiting the homepage
+    def _get_nse_cookies(self, force: bool = False):
+        """Get cookies by visiting the NSE homepage, unless the session got them recently"""
+        with self._nse_cookie_lock:
+            fresh = (
+                self._nse_cookies_fetched_at is not None
+                and time.monotonic() - self._nse_cookies_fetched_at < NSE_COOKIE_MAX_AGE
+            )
+            if fresh and not force:
+                return
             try:
                 self.nse_session.get('https://www.nseindia.com', timeout=5)
             except:
                 pass  # Ignore if homepage fails
+            self._nse_cookies_fetched_at = time.monotonic()
+    
+    def _fetch_from_nse(self, symbol: str, retry: bool = True) -> Optional[Decimal]:
+        """Fetch price from NSE India"""
+        try:
+            self._get_nse_cookies()
             
             url = f"{self.base_urls['nse']}{symbol}"
             response = self.nse_session.get(url, timeout=10)
             
+            if response.status_code in (401, 403) and retry:
+                # Cookies expired early: get new ones and try once more
+                self._get_nse_cookies(force=True)
+                return self._fetch_from_nse(symbol, retry=False)
+            
             if response.status_code == 200:
                 try:
-                    data = response.json()
+                    data = parse_json(response)
                     # NSE returns price in 'priceInfo' -> 'lastPrice'
                     if 'priceInfo' in data and 'lastPrice' in data['priceInfo']:
                         price = data['priceInfo']['lastPrice']
                         return Decimal(str(price))
                 except ValueError as ve:
-                    # JSON decode error - likely HTML response
+                    # JSON decode error - likely an HTML page served without valid cookies
                     logger.debug(f"NSE returned non-JSON response for {symbol}")
+                    if retry:
+                        self._get_nse_cookies(force=True)
+                        return self._fetch_from_nse(symbol, retry=False)
                     return None
             
             return None
@@ -101,10 +195,10 @@ class StockPriceFetcher:
             yahoo_symbol = f"{symbol}.NS"
             url = f"{self.base_urls['yahoo']}{yahoo_symbol}"
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.yahoo_session.get(url, timeout=10)
             
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 # Navigate to current price in Yahoo's response
                 if 'chart' in data and 'result' in data['chart']:
                     results = data['chart']['result']
@@ -120,36 +214,134 @@ class StockPriceFetcher:
             logger.debug(f"Yahoo Finance fetch failed for {symbol}: {str(e)}")
             return None
     
+    def _get_yahoo_crumb(self, force: bool = False) -> Optional[str]:
+        """Get the quote endpoint's crumb, unless the session already has one"""
+        if self._yahoo_crumb_fetched and not force:
+            return self._yahoo_crumb
+        self._yahoo_crumb = None
+        try:
+            # fc.yahoo.com answers 404 but sets the cookie the crumb is tied to
+            self.yahoo_session.get(self.base_urls['yahoo_cookie'], timeout=5)
+            response = self.yahoo_session.get(
+                self.base_urls['yahoo_crumb'], headers={'Accept': '*/*'}, timeout=5
+            )
+            crumb = response.text.strip()
+            if response.status_code == 200 and crumb and '<' not in crumb:
+                self._yahoo_crumb = crumb
+            else:
+                logger.debug(f"Yahoo Finance crumb request returned status {response.status_code}")
+        except Exception as e:
+            logger.debug(f"Yahoo Finance crumb request failed: {str(e)}")
+        self._yahoo_crumb_fetched = True
+        return self._yahoo_crumb
+    
+    def _fetch_yahoo_batch(self, symbols: list, retry: bool = True) -> Dict[str, Decimal]:
+        """Fetch prices for up to YAHOO_QUOTE_BATCH_SIZE symbols with one Yahoo Finance request"""
+        crumb = self._get_yahoo_crumb()
+        if not crumb:
+            return {}
+        try:
+            params = {
+                'symbols': ','.join(f"{symbol}.NS" for symbol in symbols),
+                'crumb': crumb,
+            }
+            response = self.yahoo_session.get(self.base_urls['yahoo_quote'], params=params, timeout=10)
+            if response.status_code in (401, 403) and retry:
+                # Crumb expired: get a new one and try once more
+                self._get_yahoo_crumb(force=True)
+                return self._fetch_yahoo_batch(symbols, retry=False)
+            if response.status_code != 200:
+                logger.debug(f"Yahoo Finance quote batch returned status {response.status_code}")
+                return {}
+            
+            prices = {}
+            for quote in parse_json(response).get('quoteResponse', {}).get('result') or []:
+                yahoo_symbol = quote.get('symbol', '')
+                price = quote.get('regularMarketPrice')
+                if yahoo_symbol.endswith('.NS') and price:
+                    prices[yahoo_symbol[:-3]] = Decimal(str(price))
+            return prices
+            
+        except Exception as e:
+            logger.debug(f"Yahoo Finance quote batch failed: {str(e)}")
+            return {}
+    
     def fetch_multiple_prices(self, symbols: list) -> Dict[str, Dict]:
-        """Fetch prices for multiple symbols"""
-        results = {}
+        """
+        Fetch prices for multiple symbols
+        
+        Cached prices are reused and the rest are asked for in batches of
+        YAHOO_QUOTE_BATCH_SIZE. Symbols a batch doesn't return go through
+        fetch_price()'s per-symbol sources, up to PRICE_FETCH_WORKERS at once.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        
+        # Read every cached price in one round-trip and only fetch the rest
+        keys = {symbol: self._price_cache_key(symbol) for symbol in symbols}
+        cached = cache.get_many(keys.values())
+        results = {symbol: cached[key] for symbol, key in keys.items() if key in cached}
+        missing = [symbol for symbol in symbols if symbol not in results]
+        if not missing:
+            return results
+        
+        fetched = {}
+        for start in range(0, len(missing), YAHOO_QUOTE_BATCH_SIZE):
+            if self._yahoo_crumb_fetched and not self._yahoo_crumb:
+                break
+            prices = self._fetch_yahoo_batch(missing[start:start + YAHOO_QUOTE_BATCH_SIZE])
+            for symbol, price in prices.items():
+                if symbol in keys:
+                    fetched[symbol] = self._price_result(symbol, price, 'Yahoo Finance')
         
-        for symbol in symbols:
-            result = self.fetch_price(symbol)
-            results[symbol] = result
+        unfetched = [symbol for symbol in missing if symbol not in fetched]
+        if unfetched:
+            with ThreadPoolExecutor(max_workers=min(PRICE_FETCH_WORKERS, len(unfetched))) as executor:
+                fetched.update(zip(unfetched, executor.map(self._fetch_price, unfetched)))
         
-        return results
+        by_timeout = defaultdict(dict)
+        for symbol, result in fetched.items():
+            by_timeout[self._price_cache_timeout(result)][keys[symbol]] = result
+        for timeout, entries in by_timeout.items():
+            cache.set_many(entries, timeout=timeout)
+        
+        results.update(fetched)
+        return {symbol: results[symbol] for symbol in symbols}
     
     def update_stock_prices(self, stocks_queryset):
-        """Update prices for a queryset of Stock objects"""
+        """
+        Update prices for a queryset (or list) of Stock objects
+        
+        The new prices are written with one bulk UPDATE, and the holdings of
+        those stocks are revalued with another.
+        """
         updated_count = 0
         failed_count = 0
+        updated_stocks = []
+        
+        stocks = list(stocks_queryset)
+        results = self.fetch_multiple_prices([stock.symbol for stock in stocks])
         
-        for stock in stocks_queryset:
-            result = self.fetch_price(stock.symbol)
+        for stock in stocks:
+            result = results[stock.symbol]
             
             if result['success']:
                 stock.current_price = result['current_price']
                 stock.price_updated_at = result['timestamp']
-                stock.save(update_fields=['current_price', 'price_updated_at'])
                 updated_count += 1
+                updated_stocks.append(stock)
                 logger.info(f"Updated price for {stock.symbol}: ₹{result['current_price']} (from {result['source']})")
             else:
                 failed_count += 1
                 logger.debug(f"Failed to update price for {stock.symbol}")
         
+        if updated_stocks:
+            # bulk_update() skips the post_save signal that revalues holdings
+            Stock.objects.bulk_update(updated_stocks, ['current_price', 'price_updated_at'], batch_size=500)
+            Holding.objects.filter(stock__in=updated_stocks).refresh_last_values()
+        
         return {
             'updated': updated_count,
             'failed': failed_count,
-            'total': stocks_queryset.count()
+            'total': updated_count + failed_count,
+            'updated_stocks': updated_stocks,
         }
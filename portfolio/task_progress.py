@@ -3,20 +3,38 @@ Background task handling for portfolio operations
 """
 import json
 import logging
+import threading
+import time
 from datetime import datetime
 from django.core.cache import cache
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Progress updates closer together than this are coalesced into one cache write
+PROGRESS_FLUSH_INTERVAL = 0.2
+
+# How long task data is kept in the cache, and in memory for a task that
+# stops updating without being completed
+TASK_TIMEOUT = 60 * 60
+
 
 class TaskProgress:
     """Track progress of long-running tasks"""
     
-    @staticmethod
-    def create_task(task_id, task_type, total_items=0):
+    # Latest data of the tasks running in this process, so updates don't read
+    # the cache back, when each was last updated and written to the cache, and
+    # which have updates not yet written
+    _tasks = {}
+    _last_update = {}
+    _last_flush = {}
+    _pending = set()
+    _lock = threading.Lock()
+    
+    @classmethod
+    def create_task(cls, task_id, task_type, total_items=0):
         """Create a new task progress tracker"""
-        cache.set(f'task_{task_id}', {
+        task_data = {
             'task_id': task_id,
             'task_type': task_type,
             'status': 'PENDING',
@@ -28,27 +46,50 @@ class TaskProgress:
             'completed_at': None,
             'result': None,
             'error': None,
-        }, timeout=3600)  # 1 hour timeout
+        }
+        with cls._lock:
+            cls._flush_due()
+            cls._tasks[task_id] = task_data
+            cls._last_update[task_id] = time.monotonic()
+            cls._flush(task_id, task_data)
         
         return task_id
     
-    @staticmethod
-    def update_progress(task_id, progress, current_item='', message=''):
-        """Update task progress"""
-        task_data = cache.get(f'task_{task_id}')
-        if task_data:
-            task_data['progress'] = progress
-            task_data['status'] = 'IN_PROGRESS'
-            if current_item:
-                task_data['current_item'] = current_item
-            if message:
-                task_data['message'] = message
-            cache.set(f'task_{task_id}', task_data, timeout=3600)
+    @classmethod
+    def update_progress(cls, task_id, progress, current_item='', message=''):
+        """
+        Update task progress
+        
+        Written to the cache at most every PROGRESS_FLUSH_INTERVAL seconds, and
+        whenever progress reaches a multiple of 10. An update held back is
+        written by the next TaskProgress call after the interval, including
+        get_progress(); complete_task() writes the final state.
+        """
+        with cls._lock:
+            cls._flush_due()
+            task_data = cls._tasks.get(task_id) or cache.get(f'task_{task_id}')
+            if task_data:
+                task_data['progress'] = progress
+                task_data['status'] = 'IN_PROGRESS'
+                if current_item:
+                    task_data['current_item'] = current_item
+                if message:
+                    task_data['message'] = message
+                cls._tasks[task_id] = task_data
+                cls._last_update[task_id] = now = time.monotonic()
+                
+                elapsed = now - cls._last_flush.get(task_id, 0)
+                if progress % 10 == 0 or elapsed >= PROGRESS_FLUSH_INTERVAL:
+                    cls._flush(task_id, task_data)
+                else:
+                    cls._pending.add(task_id)
     
-    @staticmethod
-    def complete_task(task_id, result=None, error=None):
+    @classmethod
+    def complete_task(cls, task_id, result=None, error=None):
         """Mark task as complete"""
-        task_data = cache.get(f'task_{task_id}')
+        with cls._lock:
+            task_data = cls._forget(task_id) or cache.get(f'task_{task_id}')
+            cls._flush_due()
         if task_data:
             task_data['status'] = 'COMPLETED' if not error else 'FAILED'
             task_data['progress'] = 100
@@ -56,14 +97,47 @@ class TaskProgress:
             task_data['result'] = result
             task_data['error'] = error
             task_data['message'] = 'Completed!' if not error else f'Error: {error}'
-            cache.set(f'task_{task_id}', task_data, timeout=3600)
+            cache.set(f'task_{task_id}', task_data, timeout=TASK_TIMEOUT)
     
-    @staticmethod
-    def get_progress(task_id):
+    @classmethod
+    def get_progress(cls, task_id):
         """Get current task progress"""
+        with cls._lock:
+            cls._flush_due()
         return cache.get(f'task_{task_id}')
     
-    @staticmethod
-    def cleanup_task(task_id):
+    @classmethod
+    def cleanup_task(cls, task_id):
         """Remove task from cache"""
+        with cls._lock:
+            cls._forget(task_id)
         cache.delete(f'task_{task_id}')
+    
+    @classmethod
+    def _flush(cls, task_id, task_data):
+        """Write a task's data to the cache; called with _lock held"""
+        cache.set(f'task_{task_id}', task_data, timeout=TASK_TIMEOUT)
+        cls._last_flush[task_id] = time.monotonic()
+        cls._pending.discard(task_id)
+    
+    @classmethod
+    def _flush_due(cls):
+        """
+        Write held-back updates whose interval has passed, and drop tasks not
+        updated within TASK_TIMEOUT; called with _lock held
+        """
+        now = time.monotonic()
+        for task_id in list(cls._pending):
+            if now - cls._last_flush.get(task_id, 0) >= PROGRESS_FLUSH_INTERVAL:
+                cls._flush(task_id, cls._tasks[task_id])
+        for task_id, updated_at in list(cls._last_update.items()):
+            if now - updated_at >= TASK_TIMEOUT:
+                cls._forget(task_id)
+    
+    @classmethod
+    def _forget(cls, task_id):
+        """Drop a task's in-memory state and return its data; called with _lock held"""
+        cls._last_update.pop(task_id, None)
+        cls._last_flush.pop(task_id, None)
+        cls._pending.discard(task_id)
+        return cls._tasks.pop(task_id, None)
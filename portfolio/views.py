@@ -43,8 +43,8 @@ def portfolio_dashboard(request):
     
     user_portfolio, created = UserPortfolio.objects.get_or_create(user=first_user)
     
-    # Get all holdings
-    holdings = user_portfolio.holdings.select_related('stock').all()
+    # Get all holdings (notes are only shown on the holding detail page)
+    holdings = user_portfolio.holdings.select_related('stock').defer('notes')
     
     # Get personalized recommendations
     recommendations = PersonalizedRecommendation.objects.filter(
@@ -189,7 +189,7 @@ def update_holding(request, holding_id):
 def portfolio_analytics(request):
     """Portfolio analytics and insights"""
     portfolio = get_object_or_404(UserPortfolio, user=get_default_user())
-    holdings = portfolio.holdings.select_related('stock').all()
+    holdings = portfolio.holdings.select_related('stock').defer('notes')
     
     # Sector allocation with detailed metrics
     sector_allocation = {}
@@ -418,27 +418,28 @@ def  handle_file_import(request):
     messages.info(request, '📁 Importing portfolio... This may take a few moments.')
     
     try:
-        # Read file content
-        try:
-            file_content = uploaded_file.read().decode('utf-8')
-            print(f"DEBUG: File read successfully, length = {len(file_content)}")
-        except Exception as e:
-            print(f"DEBUG: Error reading file: {str(e)}")
-            messages.error(request, f'Error reading file: {str(e)}')
-            return redirect('portfolio:import_portfolio')
-        
         # Initialize importer
         importer = PortfolioImporter()
         print(f"DEBUG: Importer initialized")
         
         # Parse based on file type
         if uploaded_file.name.endswith('.csv'):
+            # Read file content
+            try:
+                file_content = uploaded_file.read().decode('utf-8')
+                print(f"DEBUG: File read successfully, length = {len(file_content)}")
+            except Exception as e:
+                print(f"DEBUG: Error reading file: {str(e)}")
+                messages.error(request, f'Error reading file: {str(e)}')
+                return redirect('portfolio:import_portfolio')
+            
             print(f"DEBUG: Parsing CSV file")
             holdings = importer.parse_csv(file_content, broker)
             print(f"DEBUG: Parsed {len(holdings)} holdings from CSV")
         elif uploaded_file.name.endswith('.json'):
+            # Parsed straight from the upload, so it is never read into memory whole
             print(f"DEBUG: Parsing JSON file")
-            holdings = importer.parse_json(file_content)
+            holdings = importer.parse_json_stream(uploaded_file)
             print(f"DEBUG: Parsed {len(holdings)} holdings from JSON")
         else:
             messages.error(request, 'Unsupported file format. Use CSV or JSON.')
@@ -1296,12 +1297,12 @@ def stock_events(request, symbol):
     
     stock = get_object_or_404(Stock, symbol=symbol)
     
-    # Get all events
-    insider_trades = InsiderTrade.objects.filter(stock=stock).order_by('-transaction_date')[:20]
-    bulk_deals = BulkDeal.objects.filter(stock=stock).order_by('-deal_date')[:20]
-    block_deals = BlockDeal.objects.filter(stock=stock).order_by('-deal_date')[:20]
-    corporate_actions = CorporateAction.objects.filter(stock=stock).order_by('-ex_date', '-announcement_date')[:20]
-    promoter_holdings = PromoterHolding.objects.filter(stock=stock).order_by('-quarter_end_date')[:8]
+    # Get all events (the free-text remarks aren't shown, so don't fetch them)
+    insider_trades = InsiderTrade.objects.filter(stock=stock).defer('remarks').order_by('-transaction_date')[:20]
+    bulk_deals = BulkDeal.objects.filter(stock=stock).defer('remarks').order_by('-deal_date')[:20]
+    block_deals = BlockDeal.objects.filter(stock=stock).defer('remarks').order_by('-deal_date')[:20]
+    corporate_actions = CorporateAction.objects.filter(stock=stock).defer('remarks').order_by('-ex_date', '-announcement_date')[:20]
+    promoter_holdings = PromoterHolding.objects.filter(stock=stock).with_change().order_by('-quarter_end_date')[:8]
     
     # Calculate promoter holding trend
     if promoter_holdings.count() >= 2:
@@ -1331,25 +1332,25 @@ def holding_events(request, holding_id):
     holding = get_object_or_404(PortfolioHolding, id=holding_id)
     stock = holding.stock
     
-    # Get all events (limited to last 90 days for some)
+    # Get all events (limited to last 90 days for some), skipping the unused remarks text
     ninety_days_ago = datetime.now().date() - timedelta(days=90)
     
     insider_trades = InsiderTrade.objects.filter(
         stock=stock,
         transaction_date__gte=ninety_days_ago
-    ).order_by('-transaction_date')[:15]
+    ).defer('remarks').order_by('-transaction_date')[:15]
     
     bulk_deals = BulkDeal.objects.filter(
         stock=stock,
         deal_date__gte=ninety_days_ago
-    ).order_by('-deal_date')[:15]
+    ).defer('remarks').order_by('-deal_date')[:15]
     
     block_deals = BlockDeal.objects.filter(
         stock=stock,
         deal_date__gte=ninety_days_ago
-    ).order_by('-deal_date')[:15]
+    ).defer('remarks').order_by('-deal_date')[:15]
     
-    corporate_actions = CorporateAction.objects.filter(stock=stock).order_by('-ex_date', '-announcement_date')[:10]
+    corporate_actions = CorporateAction.objects.filter(stock=stock).defer('remarks').order_by('-ex_date', '-announcement_date')[:10]
     promoter_holdings = PromoterHolding.objects.filter(stock=stock).order_by('-quarter_end_date')[:8]
     
     # Get related news
@@ -1440,16 +1441,10 @@ def fetch_stock_events_ajax(request):
         
         if event_type in ['promoter', 'all']:
             holdings = fetcher.fetch_promoter_holding(symbol)
-            saved = 0
-            for holding_data in holdings:
-                _, created = PromoterHolding.objects.update_or_create(
-                    stock=stock,
-                    quarter_end_date=holding_data['quarter_end_date'],
-                    defaults=holding_data
-                )
-                if created:
-                    saved += 1
-            results['fetched']['promoter_holdings'] = saved
+            results['fetched']['promoter_holdings'] = PromoterHolding.bulk_upsert(
+                [PromoterHolding(stock=stock, **h) for h in holdings],
+                fields={field for h in holdings for field in h},
+            )
         
         return JsonResponse(results)
         
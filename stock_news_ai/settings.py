@@ -168,6 +168,20 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Cache Configuration
+# Shared across workers through Redis when REDIS_URL is set; otherwise each
+# process keeps its own in-memory cache
+if config('REDIS_URL', default=''):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+            'OPTIONS': {
+                'serializer': 'stock_news_ai.cache.GzipRedisSerializer',
+            },
+        }
+    }
+
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
@@ -185,6 +199,7 @@ NEWS_API_KEY = config('NEWS_API_KEY', default='')
 
 # Market Configuration
 MARKET_OPEN_TIME = '09:10'  # Indian stock market opening time
+MARKET_CLOSE_TIME = '15:30'  # Indian stock market closing time
 PRE_MARKET_CUTOFF = '09:10'  # News collection cutoff
 
 # Default primary key field type